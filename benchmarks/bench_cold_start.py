@@ -0,0 +1,126 @@
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# app.py's module-level imports before and after moving torch/transformers
+# behind the background loaders
+IMPORTS = {
+    "before": (
+        "import streamlit; from transformers import pipeline; "
+        "import src.commons.chat_generator, src.commons.precision, "
+        "src.commons.retriever; import diffusers; "
+        "from diffusers import StableDiffusionPipeline"
+    ),
+    "after": (
+        "import streamlit; import src.commons.background_loader, "
+        "src.commons.image_worker, src.commons.inference_client, "
+        "src.commons.model_registry, src.commons.precision, "
+        "src.commons.prompt_cache"
+    ),
+}
+
+
+def measure_imports(statement):
+    code = (
+        "import resource, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+        "print(elapsed, peak / (1024**2 if sys.platform == 'darwin' else 1024))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.split()
+    return {
+        "seconds": round(float(output[0]), 2),
+        "peak_rss_mb": round(float(output[1]), 1),
+    }
+
+
+def load_two_pass(base_dir, unet_dir):
+    # previous behaviour: the stock UNet is loaded with the pipeline, then
+    # the fine-tuned one, and both are alive until the assignment
+    from diffusers import StableDiffusionPipeline, UNet2DConditionModel
+
+    if base_dir is None:
+        return StableDiffusionPipeline.from_pretrained(
+            "runwayml/stable-diffusion-v1-5"
+        ).unet.from_pretrained(unet_dir)
+    stock = UNet2DConditionModel.from_pretrained(base_dir)
+    return stock.from_pretrained(unet_dir)
+
+
+def load_single_pass(base_dir, unet_dir):
+    from diffusers import UNet2DConditionModel
+
+    if base_dir is None:
+        from src.commons.image_worker import load_image_pipeline
+
+        return load_image_pipeline(os.path.dirname(unet_dir)).unet
+    return UNet2DConditionModel.from_pretrained(unet_dir, use_safetensors=True)
+
+
+def _worker(name, base_dir, unet_dir, results):
+    from src.commons.resource_usage import peak_rss_mb
+
+    # baseline after importing torch/diffusers, so only loading is compared
+    import diffusers
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    loaders = {"two_pass": load_two_pass, "single_pass": load_single_pass}
+    loaders[name](base_dir, unet_dir)
+    results[name] = {
+        "seconds": round(time.perf_counter() - start, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "load_rss_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def tiny_unet_dirs(path):
+    from benchmarks.tiny_models import tiny_sd_components
+
+    base_dir = os.path.join(path, "stock")
+    unet_dir = os.path.join(path, "model", "unet")
+    tiny_sd_components(seed=0).unet.save_pretrained(base_dir)
+    tiny_sd_components(seed=1).unet.save_pretrained(unet_dir)
+    return base_dir, unet_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--image-model-dir",
+        default=None,
+        help="fine-tuned image model (full UNet); default uses a tiny UNet",
+    )
+    args = parser.parse_args()
+
+    for name, statement in IMPORTS.items():
+        print(f"app imports {name:6s} {json.dumps(measure_imports(statement))}")
+
+    with tempfile.TemporaryDirectory() as path:
+        if args.image_model_dir is None:
+            base_dir, unet_dir = tiny_unet_dirs(path)
+        else:
+            base_dir, unet_dir = None, os.path.join(args.image_model_dir, "unet")
+
+        # one process per loader: peak RSS is a per-process high-water mark
+        context = multiprocessing.get_context("spawn")
+        results = context.Manager().dict()
+        for name in ("two_pass", "single_pass"):
+            process = context.Process(
+                target=_worker, args=(name, base_dir, unet_dir, results)
+            )
+            process.start()
+            process.join()
+            if name in results:
+                print(f"unet load {name:11s} {json.dumps(results[name])}")
+            else:
+                print(f"unet load {name:11s} failed (exit code {process.exitcode})")
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import torch
+from torch.nn.parallel import DistributedDataParallel
+
+from benchmarks.tiny_models import random_image_batch, tiny_sd_components
+from src.commons import distributed
+from tools.train_image_model import TrainImageModel
+
+
+def worker(global_batch, steps):
+    rank, world_size = distributed.setup()
+    trainer = TrainImageModel()
+    trainer.pipeline = tiny_sd_components()
+    trainer.unet = trainer.pipeline.unet
+    trainer.noise_scheduler = trainer.pipeline.scheduler
+    params = trainer.prepare_unet()
+    if world_size > 1:
+        trainer.ddp_unet = DistributedDataParallel(trainer.unet)
+    optimizer = torch.optim.AdamW(params, lr=1e-5)
+    local_batch = global_batch // world_size
+
+    def _step(seed):
+        batch = random_image_batch(local_batch, 64, seed=seed * world_size + rank)
+        loss = trainer.training_step(batch, "cpu")
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+
+    _step(0)
+    distributed.barrier()
+    start = time.perf_counter()
+    for step in range(steps):
+        _step(step + 1)
+    distributed.barrier()
+    elapsed = time.perf_counter() - start
+
+    if rank == 0:
+        print(json.dumps({"samples_per_s": global_batch * steps / elapsed}))
+    distributed.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--procs", default="1,2,4")
+    parser.add_argument("--global-batch", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--worker", action="store_true")
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.global_batch, args.steps)
+        sys.exit(0)
+
+    baseline = None
+    for procs in [int(p) for p in args.procs.split(",")]:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "torch.distributed.run",
+                "--standalone",
+                f"--nproc_per_node={procs}",
+                __file__,
+                "--worker",
+                f"--global-batch={args.global_batch}",
+                f"--steps={args.steps}",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "OMP_NUM_THREADS": str(max(1, os.cpu_count() // procs))},
+        ).stdout
+        throughput = json.loads(output.strip().splitlines()[-1])["samples_per_s"]
+        baseline = baseline or throughput
+        print(
+            f"{procs} procs | {throughput:7.2f} samples/s | "
+            f"speedup x{throughput / baseline:.2f} | "
+            f"efficiency {throughput / (baseline * procs):.0%}"
+        )
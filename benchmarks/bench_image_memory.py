@@ -0,0 +1,120 @@
+import argparse
+import json
+import multiprocessing
+from functools import partial
+
+import torch
+
+from benchmarks.tiny_models import random_image_batch, tiny_sd_components
+from src.commons.resource_usage import optimizer_state_mb, peak_rss_mb, tensor_mb
+from tools.train_image_model import TrainImageModel
+
+CONFIGS = {
+    "baseline": {},
+    "frozen": {"frozen": True},
+    "frozen+checkpointing": {"frozen": True, "gradient_checkpointing": True},
+    "frozen+checkpointing+accum4": {
+        "frozen": True,
+        "gradient_checkpointing": True,
+        "accumulation": 4,
+    },
+    "lora": {"frozen": True, "lora_rank": 4},
+}
+
+
+def legacy_training_step(trainer, batch, device):
+    # training_step before the encoders were frozen: the VAE ran under
+    # no_grad but the text encoder kept its autograd graph, and its weights
+    # collected gradients, on every step
+    with torch.no_grad():
+        latents = trainer.pipeline.vae.encode(
+            batch["pixel_values"].to(device)
+        ).latent_dist.sample()
+    encoder_hidden_states = trainer.pipeline.text_encoder(
+        input_ids=batch["input_ids"].to(device),
+        attention_mask=batch["attention_mask"].to(device),
+    )[0]
+    latents = latents * trainer.pipeline.vae.config.scaling_factor
+    noise = torch.randn_like(latents)
+    timesteps = torch.randint(
+        0,
+        trainer.noise_scheduler.config.num_train_timesteps,
+        (latents.size(0),),
+        device=device,
+    ).long()
+    noisy_latents = trainer.noise_scheduler.add_noise(latents, noise, timesteps)
+    model_pred = trainer.unet(noisy_latents, timesteps, encoder_hidden_states).sample
+    return torch.nn.functional.mse_loss(model_pred.float(), noise.float())
+
+
+def run_config(config, steps, batch_size, image_size, full):
+    trainer = TrainImageModel()
+    if full:
+        trainer.load_model()
+    else:
+        trainer.pipeline = tiny_sd_components()
+        trainer.unet = trainer.pipeline.unet
+        trainer.noise_scheduler = trainer.pipeline.scheduler
+    vocab_size = trainer.pipeline.text_encoder.config.vocab_size
+    accumulation = config.get("accumulation", 1)
+
+    if config.get("frozen"):
+        params = trainer.prepare_unet(
+            config.get("gradient_checkpointing", False), config.get("lora_rank", 0)
+        )
+        step = trainer.training_step
+    else:
+        # AdamW over every UNet parameter, encoders as before freezing
+        params = list(trainer.unet.parameters())
+        step = partial(legacy_training_step, trainer)
+    optimizer = torch.optim.AdamW(params, lr=1e-5)
+
+    baseline_rss = peak_rss_mb()
+    for i in range(steps):
+        for micro in range(accumulation):
+            batch = random_image_batch(
+                batch_size // accumulation or 1,
+                image_size,
+                vocab_size,
+                seed=i * accumulation + micro,
+            )
+            loss = step(batch, "cpu")
+            (loss / accumulation).backward()
+        optimizer.step()
+        optimizer.zero_grad()
+
+    return {
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - baseline_rss, 1),
+        "trainable_params_mb": round(tensor_mb(params), 2),
+        "optimizer_state_mb": round(optimizer_state_mb(optimizer), 2),
+    }
+
+
+def _worker(name, steps, batch_size, image_size, full, results):
+    results[name] = run_config(CONFIGS[name], steps, batch_size, image_size, full)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--full", action="store_true")
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    args = parser.parse_args()
+    image_size = 512 if args.full else 64
+
+    # one process per configuration: peak RSS is a per-process high-water mark
+    context = multiprocessing.get_context("spawn")
+    results = context.Manager().dict()
+    for name in args.configs.split(","):
+        process = context.Process(
+            target=_worker,
+            args=(name, args.steps, args.batch_size, image_size, args.full, results),
+        )
+        process.start()
+        process.join()
+        if name in results:
+            print(f"{name:30s} {json.dumps(results[name])}")
+        else:
+            print(f"{name:30s} failed (exit code {process.exitcode})")
@@ -0,0 +1,71 @@
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+from src.commons.inference_client import InferenceClient
+
+
+def run_level(url, concurrency, requests_per_client, max_new_tokens):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def _client(worker):
+        client = InferenceClient(url)
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                client.generate(
+                    f"Exercice {worker}-{i}: comment faire un squat ?",
+                    max_new_tokens=max_new_tokens,
+                )
+            except requests.RequestException as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=_client, args=(w,)) for w in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "p50_s": statistics.median(latencies) if latencies else None,
+        "p99_s": (
+            latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+            if latencies
+            else None
+        ),
+        "throughput_rps": len(latencies) / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    print(InferenceClient(args.url).health())
+    for level in [int(x) for x in args.levels.split(",")]:
+        result = run_level(args.url, level, args.requests, args.max_new_tokens)
+        print(
+            f"concurrency {result['concurrency']:3d} | "
+            f"p50 {result['p50_s'] or 0:.3f}s | p99 {result['p99_s'] or 0:.3f}s | "
+            f"{result['throughput_rps']:.2f} req/s | errors {result['errors']}"
+        )
+    print(InferenceClient(args.url).health())
@@ -0,0 +1,88 @@
+import argparse
+import tempfile
+import time
+
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from benchmarks.tiny_models import random_image_batch, tiny_sd_components
+from src.commons.latent_cache import LatentCache
+from tools.train_image_model import TrainImageModel
+
+
+def time_steps(trainer, batches, device="cpu"):
+    optimizer = torch.optim.AdamW(trainer.unet.parameters(), lr=1e-5)
+    start = time.perf_counter()
+    for batch in batches:
+        optimizer.zero_grad()
+        loss = trainer.training_step(batch, device)
+        loss.backward()
+        optimizer.step()
+    return len(batches) / (time.perf_counter() - start)
+
+
+class RandomImages(Dataset):
+    # stand-in for ImageDataset: same items, sizes and cache keys
+    def __init__(self, batches):
+        self.items = [
+            {name: values[j] for name, values in batch.items()}
+            for batch in batches
+            for j in range(len(batch["input_ids"]))
+        ]
+        self.sizes = [tuple(item["pixel_values"].shape[-2:]) for item in self.items]
+
+    def image_key(self, idx):
+        return LatentCache.key(self.items[idx]["pixel_values"].numpy().tobytes())
+
+    def prompt_key(self, idx):
+        return LatentCache.key(self.items[idx]["input_ids"].numpy().tobytes())
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, idx):
+        return self.items[idx]
+
+
+def cached_batches(trainer, batches, cache_dir, batch_size):
+    # the training path: precompute_latents fills the on-disk cache, and the
+    # timed steps read their batches back from it through a DataLoader
+    dataset = trainer.precompute_latents(
+        RandomImages(batches), "cpu", cache_dir=cache_dir
+    )
+    return DataLoader(dataset, batch_size=batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument(
+        "--full", action="store_true", help="use the real Stable Diffusion weights"
+    )
+    args = parser.parse_args()
+
+    trainer = TrainImageModel()
+    if args.full:
+        trainer.load_model()
+        image_size = 512
+    else:
+        trainer.pipeline = tiny_sd_components()
+        trainer.unet = trainer.pipeline.unet
+        trainer.noise_scheduler = trainer.pipeline.scheduler
+        image_size = 64
+
+    vocab_size = trainer.pipeline.text_encoder.config.vocab_size
+    batches = [
+        random_image_batch(args.batch_size, image_size, vocab_size, seed=i)
+        for i in range(args.steps)
+    ]
+
+    time_steps(trainer, batches[:2])
+    uncached = time_steps(trainer, batches)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached = time_steps(
+            trainer, cached_batches(trainer, batches, cache_dir, args.batch_size)
+        )
+    print(f"without cache: {uncached:.2f} steps/s")
+    print(f"with cache:    {cached:.2f} steps/s  x{cached / uncached:.2f}")
@@ -0,0 +1,113 @@
+import html
+import time
+
+from src.commons.data_manager import DataManager
+from src.commons.parser_manager import Extractor, ParserManager
+
+
+def legacy_get_between(text, start, end, filter_to_remove=None):
+    results = []
+    start_idx = 0
+    while True:
+        start_idx = text.find(start, start_idx)
+        if start_idx == -1:
+            break
+        start_idx += len(start)
+        end_idx = text.find(end, start_idx)
+        if end_idx == -1:
+            break
+        results.append(text[start_idx:end_idx])
+        start_idx = end_idx + len(end)
+    for item in results.copy():
+        if filter_to_remove and filter_to_remove in item:
+            results.remove(item)
+    return results
+
+
+def build_pages():
+    pages = []
+    for file_name in ["musculaction.json", "sport_passion_articles.json"]:
+        for article in DataManager.load_json(f"dataset/{file_name}"):
+            title = html.escape(article["title"])
+            paragraphs = "".join(
+                f"<p><span>{html.escape(line)}</span></p>\n"
+                for line in article["content"].split("\n")
+            )
+            pictures = "".join(
+                f'<img src="pictures/{i}.jpg"><img src="pictures/thumbs/{i}.jpg">\n'
+                for i in range(40)
+            )
+            pages.append(
+                f"<html><head><title>{title}</title></head><body>"
+                f'<div class="nav">{"<a href=#>x</a>" * 200}</div>'
+                f"{paragraphs}{pictures}</body></html>"
+            )
+    return pages
+
+
+# every path uses the same strip_tags, so the numbers only compare the
+# extraction itself
+def parse_legacy(page):
+    title = legacy_get_between(page, "<title>", "</title>")[0]
+    content = [
+        ParserManager.strip_tags(p) for p in legacy_get_between(page, "<p>", "</p>")
+    ]
+    pictures = legacy_get_between(page, "pictures/", '"', filter_to_remove="/")
+    return title, content, pictures
+
+
+extractor = Extractor(
+    {
+        "title": ("<title>", "</title>", None, 1),
+        "content": ("<p>", "</p>"),
+        "pictures": ("pictures/", '"', "/"),
+    }
+)
+
+
+def parse_extractor(page):
+    parts = extractor.extract(page)
+    content = [ParserManager.strip_tags(p) for p in parts["content"]]
+    return parts["title"][0], content, parts["pictures"]
+
+
+def parse_stream(page, chunk_size=4096):
+    chunks = (page[i : i + chunk_size] for i in range(0, len(page), chunk_size))
+    parts = extractor.extract_iter(chunks)
+    content = [ParserManager.strip_tags(p) for p in parts["content"]]
+    return parts["title"][0], content, parts["pictures"]
+
+
+def bench(fns, pages, repeat=20):
+    # rounds alternate between the parsers, so a slow patch on the machine
+    # hits all of them alike; the best round of each is kept
+    best = {name: float("inf") for name in fns}
+    for _ in range(repeat):
+        for name, fn in fns.items():
+            start = time.perf_counter()
+            for page in pages:
+                fn(page)
+            best[name] = min(best[name], time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    pages = build_pages()
+    total_mb = sum(len(p) for p in pages) / 1e6
+    for page in pages:
+        assert parse_legacy(page) == parse_extractor(page) == parse_stream(page)
+
+    results = bench(
+        {
+            "get_between": parse_legacy,
+            "extractor": parse_extractor,
+            "extractor_stream": parse_stream,
+        },
+        pages,
+    )
+    baseline = results["get_between"]
+    for name, elapsed in results.items():
+        print(
+            f"{name:18s} {elapsed * 1000:8.2f} ms  "
+            f"{total_mb / elapsed:7.1f} MB/s  x{baseline / elapsed:.2f}"
+        )
@@ -0,0 +1,112 @@
+import argparse
+import copy
+import time
+
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    GPT2Config,
+    GPT2LMHeadModel,
+)
+
+from benchmarks.tiny_models import tiny_sd_components
+from src.commons.dataset_loader import DatasetLoader
+from src.commons.precision import (
+    autocast,
+    bf16_supported,
+    channels_last,
+    prepare_text_model,
+)
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def text_inputs(model_dir, batch_size, seq_len, vocab_size):
+    if model_dir is None:
+        generator = torch.Generator().manual_seed(0)
+        return torch.randint(0, vocab_size, (batch_size, seq_len), generator=generator)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    texts = []
+    for article in DatasetLoader("dataset"):
+        texts.append(article["title"] + "\n" + article["content"])
+        if len(texts) == batch_size:
+            break
+    ids = [tokenizer(t)["input_ids"][:seq_len] for t in texts]
+    ids = [row + [tokenizer.eos_token_id] * (seq_len - len(row)) for row in ids]
+    return torch.tensor(ids)
+
+
+def bench_text(model_dir, batch_size, seq_len, repeat):
+    if model_dir is None:
+        reference = GPT2LMHeadModel(
+            GPT2Config(n_layer=4, n_embd=256, n_head=4, n_positions=seq_len)
+        )
+    else:
+        reference = AutoModelForCausalLM.from_pretrained(model_dir)
+    reference.eval()
+    input_ids = text_inputs(model_dir, batch_size, seq_len, reference.config.vocab_size)
+
+    with torch.inference_mode():
+        ref_logits, ref_time = timed(lambda: reference(input_ids).logits, repeat)
+        ref_logp = ref_logits.log_softmax(-1)
+        labels = input_ids[:, 1:]
+        ref_nll = -ref_logp[:, :-1].gather(-1, labels[..., None]).mean()
+        print(f"text fp32  {ref_time * 1000:8.1f} ms  ppl {ref_nll.exp():.2f}")
+
+        precisions = ["int8"] + (["bf16"] if bf16_supported() else [])
+        for precision in precisions:
+            model = prepare_text_model(copy.deepcopy(reference), precision)
+            logits, elapsed = timed(lambda: model(input_ids).logits.float(), repeat)
+            logp = logits.log_softmax(-1)
+            nll = -logp[:, :-1].gather(-1, labels[..., None]).mean()
+            agreement = (logits.argmax(-1) == ref_logits.argmax(-1)).float().mean()
+            print(
+                f"text {precision:5s} {elapsed * 1000:8.1f} ms  x{ref_time / elapsed:.2f}"
+                f"  ppl {nll.exp():.2f}  top1 agreement {agreement:.3f}"
+            )
+
+
+def bench_unet(batch_size, repeat):
+    unet = tiny_sd_components().unet.eval()
+    generator = torch.Generator().manual_seed(0)
+    sample = torch.randn(batch_size, 4, 32, 32, generator=generator)
+    timesteps = torch.full((batch_size,), 500)
+    hidden = torch.randn(batch_size, 77, 32, generator=generator)
+
+    def forward(precision):
+        with torch.inference_mode(), autocast(precision):
+            return unet(sample, timesteps, hidden).sample.float()
+
+    reference, ref_time = timed(lambda: forward("fp32"), repeat)
+    print(f"unet fp32               {ref_time * 1000:8.1f} ms")
+
+    channels_last(unet)
+    sample = sample.to(memory_format=torch.channels_last)
+    modes = ["fp32"] + (["bf16"] if bf16_supported() else [])
+    for precision in modes:
+        output, elapsed = timed(lambda: forward(precision), repeat)
+        error = (output - reference).norm() / reference.norm()
+        print(
+            f"unet {precision:5s} channels_last {elapsed * 1000:8.1f} ms"
+            f"  x{ref_time / elapsed:.2f}  rel err {error:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", default=None, help="fine-tuned text model")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--seq-len", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"bf16 supported: {bf16_supported()}")
+    bench_text(args.model_dir, args.batch_size, args.seq_len, args.repeat)
+    bench_unet(args.batch_size, args.repeat)
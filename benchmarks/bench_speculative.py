@@ -0,0 +1,100 @@
+import argparse
+import time
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from benchmarks.tiny_models import pseudo_tokens, tiny_gpt2
+from src.commons.chat_generator import ChatGenerator
+from src.commons.dataset_loader import DatasetLoader
+
+
+def load_prompts(tokenizer, count, prompt_tokens):
+    # an article passage followed by a question about it, the shape of a
+    # retrieval-augmented chat prompt
+    prompts = []
+    for article in DatasetLoader("dataset"):
+        text = article["title"] + "\n" + article["content"]
+        ids = tokenizer(text)["input_ids"][:prompt_tokens]
+        prompts.append(
+            ids + tokenizer(f"\nQuestion: {article['title']}?\nAnswer:")["input_ids"]
+        )
+        if len(prompts) == count:
+            break
+    return prompts
+
+
+def run(model, prompts, new_tokens, **speculative):
+    outputs = []
+    generated = 0
+    start = time.perf_counter()
+    for ids in prompts:
+        input_ids = torch.tensor([ids])
+        output = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=new_tokens,
+            do_sample=False,
+            pad_token_id=model.config.eos_token_id,
+            **speculative,
+        )
+        outputs.append(output[0, len(ids) :].tolist())
+        generated += len(outputs[-1])
+    return outputs, generated / (time.perf_counter() - start)
+
+
+class _WordTokenizer:
+    # offline stand-in for the tiny random model: hashed word ids
+    def __init__(self, vocab_size):
+        self.vocab_size = vocab_size
+
+    def __call__(self, text):
+        return {"input_ids": pseudo_tokens(text, self.vocab_size)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", default=None, help="main (verifier) model")
+    parser.add_argument("--draft-model", default=None, help="e.g. distilgpt2")
+    parser.add_argument("--prompts", type=int, default=8)
+    parser.add_argument("--prompt-tokens", type=int, default=256)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--lookup-tokens", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.model_dir is None:
+        model = tiny_gpt2(seed=0, n_positions=512).eval()
+        draft = tiny_gpt2(seed=1, n_positions=512).eval()
+        tokenizer = _WordTokenizer(model.config.vocab_size)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(args.model_dir).eval()
+        tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+        draft = None
+        if args.draft_model is not None:
+            draft = AutoModelForCausalLM.from_pretrained(args.draft_model).eval()
+    prompts = load_prompts(tokenizer, args.prompts, args.prompt_tokens)
+
+    modes = {
+        "standard": ChatGenerator(model, tokenizer),
+        "prompt lookup": ChatGenerator(
+            model, tokenizer, prompt_lookup_tokens=args.lookup_tokens
+        ),
+    }
+    if draft is not None:
+        modes["draft model"] = ChatGenerator(model, tokenizer, assistant_model=draft)
+
+    with torch.inference_mode():
+        reference, baseline = None, None
+        for name, chat in modes.items():
+            outputs, tokens_per_s = run(
+                model, prompts, args.new_tokens, **chat.speculative_kwargs()
+            )
+            if reference is None:
+                reference, baseline = outputs, tokens_per_s
+            # greedy verification keeps exactly the main model's tokens, so
+            # any mismatch is a bug, not a quality trade-off
+            identical = sum(o == r for o, r in zip(outputs, reference))
+            print(
+                f"{name:14s} {tokens_per_s:8.1f} tokens/s  x{tokens_per_s / baseline:.2f}"
+                f"  identical outputs {identical}/{len(prompts)}"
+            )
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+from transformers import AutoTokenizer
+
+from benchmarks.tiny_models import tiny_gpt2
+from src.commons.dataset_loader import DatasetLoader
+from src.commons.text_backend import (
+    ONNX_DIR,
+    export_onnx,
+    has_export,
+    load_text_backend,
+)
+
+
+def load_prompts(tokenizer, count, prompt_tokens):
+    prompts = []
+    for article in DatasetLoader("dataset"):
+        text = article["title"] + "\n" + article["content"]
+        prompts.append(tokenizer(text)["input_ids"][:prompt_tokens])
+        if len(prompts) == count:
+            break
+    return prompts
+
+
+def generate(model, prompts, new_tokens):
+    outputs = []
+    start = time.perf_counter()
+    for ids in prompts:
+        input_ids = torch.tensor([ids])
+        output = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=new_tokens,
+            min_new_tokens=new_tokens,
+            do_sample=False,
+            pad_token_id=model.config.eos_token_id,
+        )
+        outputs.append(output[0, len(ids) :].tolist())
+    elapsed = time.perf_counter() - start
+    return outputs, elapsed / len(prompts)
+
+
+def tiny_model_dir(path):
+    # tiny random GPT-2 sharing the distilgpt2 tokenizer (fetched once)
+    model = tiny_gpt2(seed=0, vocab_size=50257, n_positions=512)
+    model.config.bos_token_id = model.config.eos_token_id = 50256
+    model.save_pretrained(path)
+    AutoTokenizer.from_pretrained("distilgpt2").save_pretrained(path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-dir", default=None, help="fine-tuned text model")
+    parser.add_argument("--prompts", type=int, default=8)
+    parser.add_argument("--prompt-tokens", type=int, default=128)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        model_dir = args.model_dir or tiny_model_dir(os.path.join(path, "model"))
+        # a registered model directory is never written to (its files are
+        # hashed in the registry): without an export, export to the temp dir
+        export_dir = os.path.join(model_dir, ONNX_DIR)
+        if not has_export(model_dir):
+            export_dir = export_onnx(model_dir, os.path.join(path, ONNX_DIR))
+
+        eager = load_text_backend(model_dir, "eager")
+        onnx = load_text_backend(model_dir, "onnx", export_dir=export_dir)
+        prompts = load_prompts(eager.tokenizer, args.prompts, args.prompt_tokens)
+
+        # parity: full-context logits, then greedy continuations (which run
+        # the exported decoder through its past_key_values inputs)
+        with torch.inference_mode():
+            input_ids = torch.tensor([prompts[0]])
+            attention_mask = torch.ones_like(input_ids)
+            reference = eager.model(input_ids, attention_mask=attention_mask).logits
+            logits = onnx.model(input_ids, attention_mask=attention_mask).logits
+            max_error = (logits - reference).abs().max().item()
+
+            generate(eager.model, prompts[:1], args.new_tokens)
+            generate(onnx.model, prompts[:1], args.new_tokens)
+            expected, eager_time = generate(eager.model, prompts, args.new_tokens)
+            outputs, onnx_time = generate(onnx.model, prompts, args.new_tokens)
+
+        identical = sum(o == e for o, e in zip(outputs, expected))
+        print(f"logits max abs error {max_error:.2e} (tolerance {args.tolerance})")
+        print(f"identical greedy outputs {identical}/{len(prompts)}")
+        print(f"eager {eager_time * 1000:8.1f} ms/prompt")
+        print(f"onnx  {onnx_time * 1000:8.1f} ms/prompt  x{eager_time / onnx_time:.2f}")
+        if max_error > args.tolerance or identical != len(prompts):
+            sys.exit(1)
@@ -0,0 +1,323 @@
+import argparse
+import itertools
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from benchmarks.bench_parser import build_pages, parse_extractor
+from benchmarks.tiny_models import (
+    pseudo_tokens,
+    random_image_batch,
+    tiny_gpt2,
+    tiny_sd_components,
+)
+from src.commons.data_manager import DataManager
+from src.commons.dataset_loader import DatasetLoader
+from src.commons.image_store import ImageStore
+from src.commons.retriever import Retriever
+from src.commons.token_dataset import TokenBlockDataset
+from tools.train_image_model import TrainImageModel
+from tools.train_text_model import TrainTextModel
+
+BASELINE = "benchmarks/baseline.json"
+BENCHMARKS = {}
+
+
+def benchmark(fn):
+    BENCHMARKS[fn.__name__.removeprefix("bench_")] = fn
+    return fn
+
+
+def metric(value, unit, better):
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@benchmark
+def bench_parse(args):
+    pages = build_pages()
+    total_mb = sum(len(p) for p in pages) / 1e6
+    elapsed = best_of(lambda: [parse_extractor(p) for p in pages], args.repeat)
+    return {
+        "parse_mb_per_s": metric(total_mb / elapsed, "MB/s", "higher"),
+        "parse_pages_per_s": metric(len(pages) / elapsed, "pages/s", "higher"),
+    }
+
+
+@benchmark
+def bench_dataset(args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = list(DatasetLoader("dataset"))
+    blocks = TokenBlockDataset.packed(
+        [pseudo_tokens(r["title"] + "\n" + r["content"], 1000) for r in records],
+        128,
+        0,
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (64, 3, 64, 64), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as path:
+        store = ImageStore(path, 64)
+        start = time.perf_counter()
+        store.append((f"image-{i}", image) for i, image in enumerate(images))
+        write = time.perf_counter() - start
+        read = best_of(
+            lambda: [store.row(f"image-{i}").sum() for i in range(len(images))],
+            args.repeat,
+        )
+    image_mb = images.nbytes / 1e6
+
+    return {
+        "dataset_build_s": metric(elapsed, "s", "lower"),
+        "dataset_peak_mb": metric(peak / 1e6, "MB", "lower"),
+        "dataset_blocks": metric(len(blocks), "blocks", "info"),
+        "image_store_write_mb_per_s": metric(image_mb / write, "MB/s", "higher"),
+        "image_store_read_mb_per_s": metric(image_mb / read, "MB/s", "higher"),
+    }
+
+
+def hashing_embedding(text, dim=384):
+    # character 3-grams hashed into a fixed-size, L2-normalised count vector
+    padded = f" {text} "
+    vector = np.zeros(dim, dtype=np.float32)
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i : i + 3].encode()) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@benchmark
+def bench_retrieval(args):
+    # hashed n-gram vectors stand in for the sentence encoder, which would
+    # need a download; the search itself is the same
+    def embed(texts):
+        return np.stack([hashing_embedding(t) for t in texts])
+
+    with tempfile.TemporaryDirectory() as path:
+        retriever = Retriever(embed, path=path)
+        start = time.perf_counter()
+        retriever.update()
+        build = time.perf_counter() - start
+        query = embed(["exercices pour les pectoraux"])[0]
+        retriever.embed = lambda texts: query[None]
+        search = best_of(lambda: retriever.search("", k=3), args.repeat * 20)
+    return {
+        "retrieval_build_s": metric(build, "s", "lower"),
+        "retrieval_search_ms": metric(search * 1000, "ms", "lower"),
+        "retrieval_chunks": metric(len(retriever), "chunks", "info"),
+    }
+
+
+@benchmark
+def bench_text_train(args):
+    model = tiny_gpt2()
+    model.train()
+    texts = (r["title"] + "\n" + r["content"] for r in DatasetLoader("dataset"))
+    blocks = TokenBlockDataset.packed(
+        [pseudo_tokens(t, model.config.vocab_size) for t in texts], 128, 0
+    )
+    loader = DataLoader(
+        blocks, batch_size=4, shuffle=False, collate_fn=TrainTextModel.data_collator
+    )
+    optimizer = torch.optim.AdamW(model.parameters(), lr=5e-5)
+    batches = itertools.cycle(loader)
+
+    def step():
+        batch = next(batches)
+        model(**batch).loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+
+    step()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    elapsed = time.perf_counter() - start
+    return {
+        "text_train_steps_per_s": metric(args.steps / elapsed, "steps/s", "higher"),
+        "text_train_tokens_per_s": metric(
+            args.steps * 4 * 128 / elapsed, "tokens/s", "higher"
+        ),
+    }
+
+
+@benchmark
+def bench_image_train(args):
+    trainer = TrainImageModel()
+    trainer.pipeline = tiny_sd_components()
+    trainer.unet = trainer.pipeline.unet
+    trainer.noise_scheduler = trainer.pipeline.scheduler
+    vocab_size = trainer.pipeline.text_encoder.config.vocab_size
+    params = trainer.prepare_unet()
+    optimizer = torch.optim.AdamW(params, lr=1e-5)
+
+    def step(seed):
+        batch = random_image_batch(2, 64, vocab_size, seed=seed)
+        trainer.training_step(batch, "cpu").backward()
+        optimizer.step()
+        optimizer.zero_grad()
+
+    step(0)
+    start = time.perf_counter()
+    for i in range(args.steps):
+        step(i + 1)
+    elapsed = time.perf_counter() - start
+    return {
+        "image_train_steps_per_s": metric(args.steps / elapsed, "steps/s", "higher")
+    }
+
+
+@benchmark
+def bench_text_inference(args):
+    model = tiny_gpt2().eval()
+    generator = torch.Generator().manual_seed(0)
+    prompt = torch.randint(1, model.config.vocab_size, (1, 64), generator=generator)
+    new_tokens = 32
+
+    def generate():
+        model.generate(
+            prompt,
+            attention_mask=torch.ones_like(prompt),
+            max_new_tokens=new_tokens,
+            min_new_tokens=new_tokens,
+            do_sample=False,
+            pad_token_id=0,
+        )
+
+    with torch.inference_mode():
+        generate()
+        elapsed = best_of(generate, args.repeat)
+    return {
+        "text_generate_ms": metric(elapsed * 1000, "ms", "lower"),
+        "text_generate_tokens_per_s": metric(
+            new_tokens / elapsed, "tokens/s", "higher"
+        ),
+    }
+
+
+@benchmark
+def bench_image_inference(args):
+    pipeline = tiny_sd_components()
+    unet, vae, scheduler = pipeline.unet.eval(), pipeline.vae.eval(), pipeline.scheduler
+    generator = torch.Generator().manual_seed(0)
+    hidden = torch.randn(1, 77, 32, generator=generator)
+    steps = 10
+
+    def generate():
+        latents = torch.randn(1, 4, 32, 32, generator=generator)
+        scheduler.set_timesteps(steps)
+        for t in scheduler.timesteps:
+            noise = unet(latents, t, hidden).sample
+            latents = scheduler.step(noise, t, latents).prev_sample
+        vae.decode(latents / vae.config.scaling_factor)
+
+    with torch.inference_mode():
+        generate()
+        elapsed = best_of(generate, args.repeat)
+    return {"image_generate_ms": metric(elapsed * 1000, "ms", "lower")}
+
+
+def environment(threads):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "threads": threads,
+    }
+
+
+def compare(results, baseline, tolerance):
+    # relative change per metric; a regression is a move in the wrong
+    # direction by more than tolerance
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None or current["better"] == "info" or not reference["value"]:
+            print(f"{name:32s} {current['value']:12.4f} {current['unit']}")
+            continue
+        change = current["value"] / reference["value"] - 1
+        worse = -change if current["better"] == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:32s} {current['value']:12.4f} {current['unit']:9s}"
+            f" baseline {reference['value']:12.4f}  {change:+7.1%}{flag}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", default=",".join(BENCHMARKS))
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--output", default=".cache/benchmarks/latest.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # fixed threads and seeds so runs on one machine are comparable
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    results = {}
+    for name in args.only.split(","):
+        print(f"running {name}…", file=sys.stderr)
+        results.update(BENCHMARKS[name](args))
+
+    report = {"environment": environment(args.threads), "results": results}
+    DataManager.create_directory(os.path.dirname(args.output))
+    DataManager.save_json(report, args.output)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        baseline = DataManager.load_json(args.baseline)
+        print(f"compared with baseline from {baseline['environment']['commit']}")
+        regressions = compare(results, baseline["results"], args.tolerance)
+    else:
+        compare(results, {}, args.tolerance)
+        # timings only compare on one machine, so the first run there
+        # becomes the reference instead of a baseline shipped with the repo
+        if not args.save_baseline:
+            print(f"no baseline at {args.baseline}: this run becomes the baseline")
+        DataManager.create_directory(os.path.dirname(args.baseline) or ".")
+        DataManager.save_json(report, args.baseline)
+        print(f"saved baseline to {args.baseline}")
+    sys.exit(1 if regressions else 0)
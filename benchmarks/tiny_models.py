@@ -0,0 +1,84 @@
+import zlib
+from types import SimpleNamespace
+
+import torch
+from diffusers import AutoencoderKL, DDPMScheduler, UNet2DConditionModel
+from transformers import CLIPTextConfig, CLIPTextModel, GPT2Config, GPT2LMHeadModel
+
+from src.commons.dataset_loader import WORD_PATTERN
+
+
+def tiny_gpt2(seed=0, vocab_size=1000, n_positions=256):
+    torch.manual_seed(seed)
+    return GPT2LMHeadModel(
+        GPT2Config(
+            vocab_size=vocab_size,
+            n_positions=n_positions,
+            n_layer=2,
+            n_embd=64,
+            n_head=4,
+            bos_token_id=0,
+            eos_token_id=0,
+        )
+    )
+
+
+def tiny_sd_components(seed=0):
+    torch.manual_seed(seed)
+    unet = UNet2DConditionModel(
+        block_out_channels=(32, 64),
+        layers_per_block=2,
+        sample_size=32,
+        in_channels=4,
+        out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=32,
+    )
+    vae = AutoencoderKL(
+        block_out_channels=(32, 64),
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownEncoderBlock2D", "DownEncoderBlock2D"),
+        up_block_types=("UpDecoderBlock2D", "UpDecoderBlock2D"),
+        latent_channels=4,
+    )
+    text_encoder = CLIPTextModel(
+        CLIPTextConfig(
+            hidden_size=32,
+            intermediate_size=37,
+            num_attention_heads=4,
+            num_hidden_layers=5,
+            vocab_size=1000,
+            max_position_embeddings=77,
+        )
+    )
+    noise_scheduler = DDPMScheduler(num_train_timesteps=1000)
+    pipeline = SimpleNamespace(
+        unet=unet, vae=vae, text_encoder=text_encoder, scheduler=noise_scheduler
+    )
+    return pipeline
+
+
+def random_image_batch(batch_size, image_size=64, vocab_size=1000, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    return {
+        "pixel_values": torch.rand(
+            batch_size, 3, image_size, image_size, generator=generator
+        )
+        * 2
+        - 1,
+        "input_ids": torch.randint(
+            0, vocab_size, (batch_size, 77), generator=generator
+        ),
+        "attention_mask": torch.ones(batch_size, 77, dtype=torch.long),
+    }
+
+
+def pseudo_tokens(text, vocab_size):
+    # stands in for a tokenizer, which would need a download; crc32 rather
+    # than hash() so ids do not change with PYTHONHASHSEED
+    return [
+        zlib.crc32(w.encode()) % (vocab_size - 1) + 1
+        for w in WORD_PATTERN.findall(text)
+    ]
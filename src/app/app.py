@@ -1,87 +1,418 @@
-import streamlit as st
-from transformers import pipeline
-from diffusers import StableDiffusionPipeline
-import torch
 import os
+import time
+
+import requests
+import streamlit as st
 
+from src.commons.background_loader import BackgroundLoader
 from src.commons.data_manager import DataManager
+from src.commons.image_worker import SCHEDULERS, ImageWorker
+from src.commons.inference_client import InferenceClient
+from src.commons.model_registry import ModelRegistry
+from src.commons.precision import IMAGE_PRECISIONS, PRECISIONS
+from src.commons.prompt_cache import PromptCache
+
+# torch and transformers are only imported by the loaders below, on a
+# background thread, so the page renders before any model is ready
 
 st.title("Simple Chat")
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "generation_state" not in st.session_state:
+    st.session_state.generation_state = {}
 
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-output_dir = DataManager.find_latest_directory("./models/", contain="text-model")
-image_output_dir = DataManager.find_latest_directory("./models/", contain="image-model")
+context_tokens = st.sidebar.slider("Context tokens", 64, 896, 512, step=64)
+max_new_tokens = st.sidebar.slider("Max new tokens", 16, 128, 80, step=16)
+image_steps = st.sidebar.slider("Image steps", 5, 50, 20)
+image_scheduler = st.sidebar.selectbox("Image scheduler", list(SCHEDULERS), index=1)
+image_seed = st.sidebar.number_input("Image seed", min_value=0, value=0, step=1)
+text_precision = st.sidebar.selectbox("Text precision", PRECISIONS)
+text_backend = st.sidebar.selectbox(
+    "Text backend",
+    ["auto", "onnx", "eager"],
+    help="auto uses the ONNX export next to the checkpoint when there is one",
+)
+decoding = st.sidebar.selectbox(
+    "Decoding", ["standard", "prompt lookup", "draft model"]
+)
+draft_model_name = None
+prompt_lookup_tokens = 0
+if decoding == "draft model":
+    draft_model_name = st.sidebar.text_input(
+        "Draft model",
+        "distilgpt2",
+        help=(
+            "must share the main model's GPT-2 tokenizer and be much smaller "
+            "than it to pay off. The main model is a fine-tuned distilgpt2, "
+            "so the default draft is its base model, the same size: it "
+            "drafts well but saves little. Use a smaller GPT-2-tokenizer "
+            "model when you have one."
+        ),
+    )
+elif decoding == "prompt lookup":
+    prompt_lookup_tokens = st.sidebar.slider(
+        "Lookup draft tokens",
+        1,
+        20,
+        10,
+        help="tokens copied per draft from n-grams already in the context",
+    )
+image_precision = st.sidebar.selectbox("Image precision", IMAGE_PRECISIONS)
+semantic_cache = st.sidebar.checkbox(
+    "Reuse answers to similar prompts",
+    value=False,
+    help=(
+        "reuses the answer to a similar earlier prompt, from any conversation "
+        "with the same model and settings, matched by sentence embedding"
+    ),
+)
+use_articles = st.sidebar.checkbox("Answer from scraped articles", value=True)
+passages_k = st.sidebar.slider("Article passages", 1, 5, 2)
 
 
 @st.cache_resource
-def get_generator():
-    return pipeline("text-generation", model=output_dir, tokenizer=output_dir)
+def get_registry():
+    return ModelRegistry("./models")
+
+
+registry = get_registry()
+output_dir = registry.latest_path("text-model")
+image_output_dir = registry.latest_path("image-model")
 
 
 @st.cache_resource
-def get_image_generator():
-    if not DataManager.exists_directory(image_output_dir):
-        return None
+def get_loader():
+    return BackgroundLoader()
+
+
+def load_generator(output_dir, backend, precision):
+    from src.commons.text_backend import load_text_backend
+
+    return load_text_backend(output_dir, backend, precision)
+
+
+def load_draft_model(model_name, precision):
+    from transformers import AutoModelForCausalLM
 
-    base_model = "runwayml/stable-diffusion-v1-5"
+    from src.commons.precision import prepare_text_model
 
-    pipe = StableDiffusionPipeline.from_pretrained(
-        base_model, torch_dtype=torch.float32
+    return prepare_text_model(
+        AutoModelForCausalLM.from_pretrained(model_name), precision
     )
 
-    pipe.unet = pipe.unet.from_pretrained(
-        os.path.join(image_output_dir, "unet"), torch_dtype=torch.float32
+
+def load_embedder():
+    from src.commons.retriever import TextEmbedder
+
+    return TextEmbedder()
+
+
+def load_retriever(embedder):
+    from src.commons.retriever import Retriever
+
+    retriever = Retriever(
+        embedder,
+        path=os.path.join(".cache/rag", embedder.model_name.replace("/", "--")),
     )
+    if retriever.stale():
+        retriever.update()
+    return retriever
+
+
+@st.cache_resource
+def get_client(server_url):
+    client = InferenceClient(server_url)
+    client.health()
+    return client
+
+
+@st.cache_resource
+def get_image_worker():
+    # one worker for the app: a new model or precision replaces its process
+    # pool instead of starting another one next to it
+    return ImageWorker()
+
+
+def configure_image_worker(image_output_dir, precision):
+    worker = get_image_worker()
+    if image_output_dir is None or not DataManager.exists_directory(image_output_dir):
+        worker.shutdown()
+        return None
+    if worker.configure(image_output_dir, precision):
+        worker.warmup()
+    return worker
+
+
+@st.cache_resource
+def get_prompt_cache(name):
+    # one cache per kind, shared by every session and kept on disk
+    return PromptCache(os.path.join(".cache/prompt_cache", f"{name}.json"))
+
+
+text_cache = get_prompt_cache("text")
+image_cache = get_prompt_cache("image")
+loader = get_loader()
+loading = []
 
-    device = "cpu"
-    pipe.to(device)
-    return pipe
+# one sentence encoder serves the article index and the semantic cache
+embedder = None
+if use_articles or semantic_cache:
+    status, value = loader.get("embedder", load_embedder)
+    if status == "ready":
+        embedder = value
+        text_cache.embed = image_cache.embed = lambda text: embedder([text])[0]
+    elif status == "loading":
+        loading.append("sentence encoder")
+    else:
+        st.sidebar.error(f"Failed to load the sentence encoder: {value}")
 
+retriever = None
+if use_articles and embedder is not None:
+    status, value = loader.get("retriever", load_retriever, embedder)
+    if status == "ready":
+        retriever = value
+        # picks up articles added by the scrapers since the last run
+        if retriever.stale():
+            loader.get(
+                ("index", retriever.current_mtime()), retriever.update, group="index"
+            )
+        st.sidebar.caption(f"{len(retriever)} article passages indexed")
+    elif status == "loading":
+        loading.append("article index")
+    else:
+        st.sidebar.error(f"Failed to load the article index: {value}")
+
+server_url = os.environ.get("INFERENCE_SERVER_URL")
 
 text_gen = None
-image_gen = None
-try:
-    text_gen = get_generator()
-except Exception as e:
-    st.sidebar.error(f"Failed to load text model: {e}")
+text_client = None
+image_worker = None
+if server_url:
+    try:
+        text_client = get_client(server_url)
+        st.sidebar.caption(f"Text model served by {server_url}")
+    except Exception as e:
+        st.sidebar.error(f"Failed to reach the inference server: {e}")
+else:
+    status, value = loader.get(
+        ("text", output_dir, text_backend, text_precision),
+        load_generator,
+        output_dir,
+        text_backend,
+        text_precision,
+        group="text",
+    )
+    if status == "ready":
+        text_gen = value
+        st.sidebar.caption(f"Text model backend: {text_gen.name}")
+    elif status == "loading":
+        loading.append("text model")
+    else:
+        st.sidebar.error(f"Failed to load text model: {value}")
+
+draft_model = None
+if decoding != "standard" and text_gen is not None and text_gen.name != "eager":
+    st.sidebar.caption("Speculative decoding needs the eager backend")
+    decoding = "standard"
+    prompt_lookup_tokens = 0
+elif draft_model_name and text_gen is not None:
+    status, value = loader.get(
+        ("draft", draft_model_name, text_precision),
+        load_draft_model,
+        draft_model_name,
+        text_precision,
+        group="draft",
+    )
+    if status == "ready":
+        draft_model = value
+    elif status == "loading":
+        loading.append("draft model")
+    else:
+        st.sidebar.error(f"Failed to load draft model: {value}")
 
 try:
-    image_gen = get_image_generator()
+    image_worker = configure_image_worker(image_output_dir, image_precision)
 except Exception as e:
     st.sidebar.error(f"Failed to load image model: {e}")
 
+
+@st.fragment(run_every=1)
+def wait_for_models():
+    if not loader.pending():
+        st.rerun()
+
+
+if loading:
+    st.sidebar.caption(f"Loading {', '.join(loading)}…")
+    wait_for_models()
+
+st.sidebar.caption(f"Text cache: {text_cache.summary()}")
+st.sidebar.caption(f"Image cache: {image_cache.summary()}")
+
+
+@st.fragment(run_every=2)
+def show_image_job(key):
+    status, value = image_worker.status(key)
+    if status == "done":
+        st.image(value, caption="Generated Image")
+    elif status == "failed":
+        st.warning(f"Image generation failed: {value}")
+    elif status == "pending":
+        st.caption("Generating image…")
+
+
+def show_message(message):
+    st.markdown(message["content"])
+    if image_worker is not None and "image_job" in message:
+        status, value = image_worker.status(message["image_job"])
+        if status == "done":
+            st.image(value, caption="Generated Image")
+        else:
+            show_image_job(message["image_job"])
+
+
+for message in st.session_state.messages:
+    with st.chat_message(message["role"]):
+        show_message(message)
+
 if prompt := st.chat_input("What is up?"):
     with st.chat_message("user"):
         st.markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
 
-    if text_gen is not None:
-        outputs = text_gen(
-            prompt,
-            max_length=100,
-            num_return_sequences=1,
-            do_sample=True,
-            top_k=50,
-            top_p=0.95,
-        )
-        assistant_content = outputs[0]["generated_text"]
-        assistant_content = assistant_content[len(prompt) :].strip()
+    text_namespace = PromptCache.namespace(
+        model=server_url or output_dir,
+        precision=text_precision,
+        context_tokens=context_tokens,
+        max_new_tokens=max_new_tokens,
+        top_k=50,
+        top_p=0.95,
+        passages=passages_k if retriever is not None else 0,
+    )
+    # an exact repeat is only reused within the same conversation
+    text_context = PromptCache.history(st.session_state.messages[:-1])
+    cache_hit, assistant_content = text_cache.lookup(
+        text_namespace, prompt, semantic=semantic_cache, context=text_context
+    )
+    model_prompt = prompt
+    if cache_hit is None and retriever is not None:
+        start = time.perf_counter()
+        passages = retriever.search(prompt, k=passages_k)
+        retrieval_ms = (time.perf_counter() - start) * 1000
+        model_prompt = retriever.augment(prompt, passages)
+        if passages:
+            st.sidebar.caption(
+                f"Retrieved in {retrieval_ms:.1f} ms: "
+                + " · ".join(dict.fromkeys(p["title"] for p in passages))
+            )
 
-        with st.chat_message("assistant"):
+    if cache_hit is not None:
+        assistant_message = st.chat_message("assistant")
+        with assistant_message:
             st.markdown(assistant_content)
+            st.caption(
+                "Cached answer"
+                + (" to a similar question" if cache_hit == "semantic" else "")
+            )
+        # the KV cache no longer matches the conversation
+        st.session_state.generation_state.clear()
+
+    elif text_client is not None:
+        context = "\n".join(
+            [m["content"] for m in st.session_state.messages[-6:-1]] + [model_prompt]
+        )
+        assistant_message = st.chat_message("assistant")
+        with assistant_message:
+            start = time.perf_counter()
+            try:
+                with st.spinner("Thinking"):
+                    assistant_content = text_client.generate(
+                        context,
+                        max_new_tokens=max_new_tokens,
+                        do_sample=True,
+                        top_k=50,
+                        top_p=0.95,
+                    )
+            except requests.RequestException as e:
+                # server down or timed out: no reply this turn
+                st.error(f"The inference server did not answer: {e}")
+            else:
+                st.markdown(assistant_content)
+                st.caption(f"Latency {time.perf_counter() - start:.2f}s")
+
+    elif text_gen is not None:
+        from src.commons.chat_generator import ChatGenerator
 
-        st.session_state.messages.append(
-            {"role": "assistant", "content": assistant_content}
+        generation_state = st.session_state.generation_state
+        if generation_state.get("model") != (output_dir, text_gen.name):
+            generation_state.clear()
+            generation_state["model"] = (output_dir, text_gen.name)
+
+        chat = ChatGenerator(
+            text_gen.model,
+            text_gen.tokenizer,
+            context_tokens=context_tokens,
+            max_new_tokens=max_new_tokens,
+            assistant_model=draft_model,
+            prompt_lookup_tokens=prompt_lookup_tokens,
+            reuse_cache=text_gen.name == "eager",
         )
+        assistant_message = st.chat_message("assistant")
+        with assistant_message:
+            assistant_content = st.write_stream(
+                chat.stream(
+                    generation_state,
+                    st.session_state.messages[:-1],
+                    model_prompt,
+                    do_sample=True,
+                    top_k=50,
+                    top_p=0.95,
+                )
+            )
+            st.caption(
+                f"Time to first token {chat.stats['ttft']:.2f}s · "
+                f"{chat.stats['tokens_per_s']:.1f} tokens/s · "
+                f"{chat.stats['reused_tokens']} cached context tokens"
+            )
+
+    elif "text model" in loading:
+        with st.chat_message("assistant"):
+            st.info("The text model is still loading, try again in a moment.")
+
+    if assistant_content is not None:
+        assistant_content = assistant_content.strip()
+        # an empty answer (e.g. generation stopped at once) is not reused
+        if cache_hit is None and assistant_content:
+            text_cache.put(
+                text_namespace, prompt, assistant_content, context=text_context
+            )
+        message = {"role": "assistant", "content": assistant_content}
 
-        if image_gen is not None:
-            with st.spinner("Generating image"):
-                image = image_gen(prompt).images[0]
+        if image_worker is not None:
+            image_namespace = PromptCache.namespace(
+                model=image_output_dir,
+                precision=image_precision,
+                seed=int(image_seed),
+                steps=image_steps,
+                scheduler=image_scheduler,
+            )
+            _, image_job = image_cache.lookup(
+                image_namespace, prompt, semantic=semantic_cache
+            )
+            if image_job is None or image_worker.status(image_job)[0] in (
+                "failed",
+                "missing",
+            ):
+                image_job = image_worker.submit(
+                    prompt,
+                    seed=int(image_seed),
+                    steps=image_steps,
+                    scheduler=image_scheduler,
+                )
+                image_cache.put(image_namespace, prompt, image_job)
+            message["image_job"] = image_job
+            with assistant_message:
+                show_image_job(message["image_job"])
 
-            st.image(image, caption="Generated Image")
+        st.session_state.messages.append(message)
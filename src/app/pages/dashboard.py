@@ -0,0 +1,88 @@
+import os
+
+import streamlit as st
+
+from src.commons.run_metrics import METRICS_FILE, find_runs, read_metrics
+
+st.title("Training dashboard")
+
+runs = find_runs("./models")
+if not runs:
+    st.info("No run has written metrics yet.")
+    st.stop()
+
+run = st.selectbox("Run", runs, format_func=os.path.basename)
+
+
+def append(series, entry):
+    # a resumed run logs again from its checkpoint step: what it redoes
+    # replaces the lines written before the interruption
+    while series and series[-1]["step"] >= entry["step"]:
+        series.pop()
+    series.append(entry)
+
+
+@st.fragment(run_every=5)
+def show_run(run):
+    # tail the metrics file: only the bytes added since the last refresh
+    # are parsed
+    tail = st.session_state.setdefault("dashboard", {})
+    if tail.get("run") != run:
+        tail.update(run=run, offset=0, steps=[], losses=[], validation=[])
+    records, tail["offset"] = read_metrics(
+        os.path.join(run, METRICS_FILE), tail["offset"]
+    )
+    for record in records:
+        if "step_time" in record:
+            append(tail["steps"], record)
+        if record.get("loss") is not None:
+            append(tail["losses"], {"step": record["step"], "loss": record["loss"]})
+        val_loss = record.get("val_loss", record.get("eval_loss"))
+        if val_loss is not None:
+            append(tail["validation"], {"step": record["step"], "val_loss": val_loss})
+
+    steps = tail["steps"]
+    if not steps:
+        st.caption("Waiting for the first step…")
+        return
+
+    last = steps[-1]
+    columns = st.columns(4)
+    columns[0].metric("Step", last["step"])
+    columns[1].metric("Samples/s", f"{last['samples_per_s']:.2f}")
+    columns[2].metric("Step time", f"{last['step_time']:.2f}s")
+    columns[3].metric("Peak RSS", f"{last['peak_rss_mb']:.0f} MB")
+
+    if tail["losses"]:
+        st.subheader("Training loss")
+        st.line_chart(tail["losses"], x="step")
+    if tail["validation"]:
+        st.subheader("Validation loss")
+        st.line_chart(tail["validation"], x="step")
+
+    st.subheader("Where step time goes")
+    st.area_chart(
+        [{"step": r["step"], **r["breakdown"]} for r in steps[-500:]], x="step"
+    )
+    sections = sorted({k for r in steps[-50:] for k in r["breakdown"]})
+    st.table(
+        {
+            "section": sections,
+            "mean s (last 50 steps)": [
+                sum(r["breakdown"].get(k, 0.0) for r in steps[-50:]) / len(steps[-50:])
+                for k in sections
+            ],
+        }
+    )
+
+    st.subheader("Learning rate")
+    st.line_chart([{"step": r["step"], "lr": r["lr"]} for r in steps], x="step")
+
+    st.subheader("Peak RSS (MB)")
+    st.line_chart(
+        [{"step": r["step"], "peak_rss_mb": r["peak_rss_mb"]} for r in steps],
+        x="step",
+    )
+
+
+show_run(run)
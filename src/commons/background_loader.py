@@ -0,0 +1,41 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundLoader:
+    # Runs slow constructors (model loads) on worker threads, one per key.
+    # The app asks for a resource on every rerun and gets ("loading", None)
+    # until it is ready, so the first render never waits on a model.
+    def __init__(self, max_workers: int = 2):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+        self.groups = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, fn, *args, group=None) -> tuple:
+        # keys in the same group supersede each other (one per model
+        # setting, one per index version): asking for a new one forgets the
+        # others, so their results can be freed instead of piling up
+        with self._lock:
+            future = self.futures.get(key)
+            if future is None:
+                if group is not None:
+                    for old in [k for k, g in self.groups.items() if g == group]:
+                        self.futures.pop(old).cancel()
+                        del self.groups[old]
+                    self.groups[key] = group
+                future = self.futures[key] = self.pool.submit(fn, *args)
+        if not future.done():
+            return "loading", None
+        error = future.exception()
+        if error is not None:
+            # forget the failure so the next call tries again
+            with self._lock:
+                self.futures.pop(key, None)
+                self.groups.pop(key, None)
+            return "failed", error
+        return "ready", future.result()
+
+    def pending(self) -> bool:
+        with self._lock:
+            return any(not f.done() for f in self.futures.values())
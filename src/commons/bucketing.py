@@ -0,0 +1,96 @@
+import math
+import random
+
+from torch.utils.data import Sampler, Subset
+
+ASPECT_RATIOS = (1.0, 4 / 3, 3 / 4, 16 / 9, 9 / 16)
+
+
+def bucket_sizes(image_size: int, ratios=ASPECT_RATIOS, multiple: int = 64) -> list:
+    # (width, height) per aspect ratio with about image_size**2 pixels, both
+    # sides a multiple of 64 so the latents divide through the UNet
+    sizes = []
+    for ratio in ratios:
+        width = max(
+            multiple, round(image_size * math.sqrt(ratio) / multiple) * multiple
+        )
+        height = max(
+            multiple, round(image_size / math.sqrt(ratio) / multiple) * multiple
+        )
+        if (width, height) not in sizes:
+            sizes.append((width, height))
+    return sizes
+
+
+def nearest_bucket(width: int, height: int, sizes: list) -> tuple:
+    ratio = math.log(width / height)
+    return min(sizes, key=lambda size: abs(math.log(size[0] / size[1]) - ratio))
+
+
+def dataset_sizes(dataset) -> list:
+    # per-item (width, height), looking through Subset wrappers; datasets
+    # without a sizes attribute are one bucket
+    if isinstance(dataset, Subset):
+        sizes = dataset_sizes(dataset.dataset)
+        return [sizes[i] for i in dataset.indices]
+    return list(getattr(dataset, "sizes", None) or [None] * len(dataset))
+
+
+class BucketBatchSampler(Sampler):
+    # Batches only contain items of the same size. Items are shuffled within
+    # their bucket and the batches are shuffled across buckets, both seeded
+    # by seed + epoch, so the order replays exactly on resume. With several
+    # replicas each rank takes every num_replicas-th batch, padded so all
+    # ranks step the same number of times.
+    def __init__(
+        self,
+        sizes: list,
+        batch_size: int,
+        shuffle: bool = True,
+        seed: int = 0,
+        num_replicas: int = 1,
+        rank: int = 0,
+    ):
+        self.sizes = sizes
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+
+        self.buckets = {}
+        for idx, size in enumerate(sizes):
+            self.buckets.setdefault(size, []).append(idx)
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def batches(self) -> list:
+        rng = random.Random(self.seed + self.epoch)
+        batches = []
+        for indices in self.buckets.values():
+            indices = list(indices)
+            if self.shuffle:
+                rng.shuffle(indices)
+            batches.extend(
+                indices[i : i + self.batch_size]
+                for i in range(0, len(indices), self.batch_size)
+            )
+        if self.shuffle:
+            rng.shuffle(batches)
+        if self.num_replicas > 1 and batches:
+            padding = -len(batches) % self.num_replicas
+            batches += [batches[i % len(batches)] for i in range(padding)]
+            batches = batches[self.rank :: self.num_replicas]
+        return batches
+
+    def __iter__(self):
+        return iter(self.batches())
+
+    def __len__(self) -> int:
+        total = sum(
+            math.ceil(len(indices) / self.batch_size)
+            for indices in self.buckets.values()
+        )
+        return math.ceil(total / self.num_replicas)
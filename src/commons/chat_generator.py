@@ -0,0 +1,128 @@
+import threading
+import time
+
+import torch
+from transformers import TextIteratorStreamer
+
+
+class ChatGenerator:
+    # Streams a reply on a background generate() thread. The token ids and
+    # KV cache of the previous turn are kept in `state` (the caller's
+    # session), so a follow-up only encodes the new prompt tokens as long as
+    # the conversation fits in the context budget.
+    # Speculative decoding: with assistant_model (a smaller model sharing the
+    # tokenizer) or prompt_lookup_tokens (drafts copied from n-grams already
+    # in the context, which includes the retrieved passages), generate()
+    # verifies several drafted tokens per forward pass of the main model.
+    # reuse_cache=False re-encodes every turn, for backends (the exported
+    # ONNX decoder) that cannot resume generate() from a returned cache.
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        context_tokens=512,
+        max_new_tokens=80,
+        assistant_model=None,
+        prompt_lookup_tokens=0,
+        reuse_cache=True,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.assistant_model = assistant_model
+        self.prompt_lookup_tokens = prompt_lookup_tokens
+        self.reuse_cache = reuse_cache
+        max_positions = getattr(model.config, "n_positions", None) or getattr(
+            model.config, "max_position_embeddings", 1024
+        )
+        self.max_new_tokens = max_new_tokens
+        self.context_tokens = min(context_tokens, max_positions - max_new_tokens)
+        self.stats = {}
+
+    def encode(self, text: str) -> list:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def build_context(self, messages: list, prompt: str) -> list:
+        ids = self.encode(prompt)
+        for message in reversed(messages):
+            turn = self.encode(message["content"] + "\n")
+            if len(ids) + len(turn) > self.context_tokens:
+                break
+            ids = turn + ids
+        return ids[-self.context_tokens :]
+
+    def prepare(self, state: dict, messages: list, prompt: str):
+        if state.get("ids") and self.reuse_cache:
+            ids = state["ids"] + self.encode("\n" + prompt)
+            if len(ids) <= self.context_tokens:
+                return ids, state["past_key_values"]
+        return self.build_context(messages, prompt), None
+
+    def speculative_kwargs(self) -> dict:
+        if self.assistant_model is not None:
+            return {"assistant_model": self.assistant_model}
+        if self.prompt_lookup_tokens:
+            return {"prompt_lookup_num_tokens": self.prompt_lookup_tokens}
+        return {}
+
+    def stream(self, state: dict, messages: list, prompt: str, **generate_kwargs):
+        ids, past_key_values = self.prepare(state, messages, prompt)
+        speculative = self.speculative_kwargs()
+        if speculative:
+            # assisted generation manages its own caches for both models;
+            # the context is re-encoded instead of resumed
+            past_key_values = None
+            generate_kwargs = {**generate_kwargs, **speculative}
+        input_ids = torch.tensor([ids])
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True
+        )
+        result = {}
+
+        def _generate():
+            try:
+                result["output"] = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past_key_values,
+                    streamer=streamer,
+                    max_new_tokens=self.max_new_tokens,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    return_dict_in_generate=True,
+                    **generate_kwargs,
+                )
+            except Exception as e:
+                result["error"] = e
+                streamer.end()
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=_generate, daemon=True)
+        thread.start()
+        first_token = None
+        for text in streamer:
+            if first_token is None and text:
+                first_token = time.perf_counter() - start
+            yield text
+        thread.join()
+        elapsed = time.perf_counter() - start
+
+        if "error" in result:
+            state.clear()
+            raise result["error"]
+
+        output = result["output"]
+        state["ids"] = output.sequences[0].tolist()
+        state["past_key_values"] = (
+            output.past_key_values if self.reuse_cache and not speculative else None
+        )
+        new_tokens = len(state["ids"]) - len(ids)
+        self.stats = {
+            "ttft": first_token or elapsed,
+            "new_tokens": new_tokens,
+            "tokens_per_s": new_tokens / elapsed if elapsed else 0.0,
+            "context_tokens": len(ids),
+            "reused_tokens": (
+                len(ids) - len(self.encode("\n" + prompt))
+                if past_key_values is not None
+                else 0
+            ),
+        }
@@ -0,0 +1,96 @@
+import os
+import random
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+class Checkpointer:
+    # Training state is snapshotted to CPU on the caller's thread (so it is
+    # consistent with the step that produced it) and written to disk on a
+    # background thread; at most one write is in flight.
+    def __init__(self, path: str, keep: int = 2):
+        self.path = path
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    def checkpoints(self) -> list:
+        if not os.path.isdir(self.path):
+            return []
+        steps = [
+            int(name.split("-")[1])
+            for name in os.listdir(self.path)
+            if name.startswith("step-")
+            and os.path.exists(os.path.join(self.path, name, "state.pt"))
+        ]
+        return [os.path.join(self.path, f"step-{s}") for s in sorted(steps)]
+
+    def latest(self) -> str | None:
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    @staticmethod
+    def rng_state() -> dict:
+        return {
+            "torch": torch.get_rng_state(),
+            "numpy": np.random.get_state(),
+            "python": random.getstate(),
+        }
+
+    @staticmethod
+    def set_rng_state(state: dict) -> None:
+        torch.set_rng_state(state["torch"])
+        np.random.set_state(state["numpy"])
+        random.setstate(state["python"])
+
+    @classmethod
+    def snapshot(cls, value):
+        # tensors are cloned to CPU one by one, containers rebuilt around
+        # them; everything else (step counters, loss lists of floats) is
+        # copied shallowly
+        if isinstance(value, torch.Tensor):
+            return value.detach().to("cpu", copy=True)
+        if isinstance(value, dict):
+            return {k: cls.snapshot(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return type(value)(cls.snapshot(v) for v in value)
+        return value
+
+    def save(self, step: int, state: dict, rng: list = None) -> None:
+        # rng: one rng_state() per rank (distributed.gather), so every rank
+        # resumes its own random stream; defaults to this process only
+        snapshot = self.snapshot(state)
+        snapshot["rng"] = rng if rng is not None else [self.rng_state()]
+        self.wait()
+        self._pending = self._pool.submit(self._write, step, snapshot)
+
+    def _write(self, step: int, snapshot: dict) -> None:
+        directory = os.path.join(self.path, f"step-{step}")
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, "state.pt.tmp")
+        torch.save(snapshot, tmp_path)
+        os.replace(tmp_path, os.path.join(directory, "state.pt"))
+        for old in self.checkpoints()[: -self.keep]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def wait(self) -> None:
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def load(self, checkpoint: str, rank: int = 0) -> dict:
+        # restores this rank's random state when the checkpoint has one;
+        # state["rng"] is shorter than the world size when it was saved by a
+        # run with fewer ranks, and the caller has to seed the others
+        state = torch.load(
+            os.path.join(checkpoint, "state.pt"), map_location="cpu", weights_only=False
+        )
+        if isinstance(state["rng"], dict):
+            # saved before per-rank states: rank 0's only
+            state["rng"] = [state["rng"]]
+        if rank < len(state["rng"]):
+            self.set_rng_state(state["rng"][rank])
+        return state
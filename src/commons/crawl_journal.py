@@ -0,0 +1,57 @@
+import json
+import os
+from typing import List
+
+
+class CrawlJournal:
+    def __init__(self, name: str, path: str = ".cache/journal"):
+        os.makedirs(path, exist_ok=True)
+        self.file_path = os.path.join(path, f"{name}.jsonl")
+        self.entries = {}
+        self.run = 0
+        self.resumed = set()
+
+        finished = True
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # torn last line from a crashed run
+                        continue
+                    self.run = max(self.run, record["run"])
+                    if record.get("done"):
+                        finished = True
+                        continue
+                    finished = False
+                    self.entries[record["url"]] = record
+
+        if finished:
+            self.run += 1
+        else:
+            self.resumed = {
+                url for url, e in self.entries.items() if e["run"] == self.run
+            }
+        self._file = open(self.file_path, "a")
+
+    def is_done(self, url: str) -> bool:
+        return url in self.resumed
+
+    def record(self, url: str, result) -> None:
+        entry = {"run": self.run, "url": url, "result": result}
+        self.entries[url] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def results(self, urls: List[str]) -> list:
+        return [self.entries[url]["result"] for url in urls if url in self.entries]
+
+    def finish(self) -> None:
+        self._file.close()
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w") as file:
+            for entry in self.entries.values():
+                file.write(json.dumps(entry) + "\n")
+            file.write(json.dumps({"run": self.run, "done": True}) + "\n")
+        os.replace(tmp_path, self.file_path)
@@ -16,8 +16,10 @@ class DataManager:
 
     @staticmethod
     def save_json(data, file_path: str) -> None:
-        with open(file_path, "w") as file:
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as file:
             json.dump(data, file, indent=4)
+        os.replace(tmp_path, file_path)
 
     @staticmethod
     def ls_directory(path: str):
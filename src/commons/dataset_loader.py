@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import re
+from typing import Iterator
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+")
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class DatasetLoader:
+    # Streams normalized {title, content, pictures_urls, source} records from
+    # dataset/*.json and dataset/*.jsonl, dropping exact and near duplicates
+    # (MinHash over word 3-grams, LSH banding to find candidates).
+
+    def __init__(
+        self,
+        path: str = "dataset",
+        dedup: bool = True,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 16,
+        chunk_size: int = 1 << 16,
+    ):
+        self.path = path
+        self.dedup = dedup
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.chunk_size = chunk_size
+        self.duplicates = 0
+
+        rng = np.random.default_rng(0)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def files(self):
+        return sorted(
+            f"{self.path}/{file_name}"
+            for file_name in os.listdir(self.path)
+            if file_name.endswith((".json", ".jsonl"))
+        )
+
+    def iter_file(self, file_path: str) -> Iterator[dict]:
+        if file_path.endswith(".jsonl"):
+            with open(file_path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+            return
+
+        # incremental decode of a top-level JSON array, one element at a time
+        decoder = json.JSONDecoder()
+        buffer = ""
+        pos = 0
+        started = False
+        with open(file_path, "r") as file:
+            while True:
+                chunk = file.read(self.chunk_size)
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                while True:
+                    while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                        pos += 1
+                    if not started and pos < len(buffer):
+                        if buffer[pos] != "[":
+                            raise ValueError(f"{file_path}: expected a JSON array")
+                        started = True
+                        pos += 1
+                        continue
+                    if pos < len(buffer) and buffer[pos] == "]":
+                        return
+                    try:
+                        record, end = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        break
+                    yield record
+                    pos = end
+                if not chunk:
+                    if buffer[pos:].strip():
+                        raise ValueError(f"{file_path}: truncated JSON array")
+                    return
+
+    @staticmethod
+    def normalize(record: dict, source: str) -> dict | None:
+        if not isinstance(record, dict):
+            return None
+        content = record.get("content") or ""
+        if isinstance(content, list):
+            content = "\n".join(str(c) for c in content)
+        title = (record.get("title") or "").strip()
+        content = content.strip()
+        if not title and not content:
+            return None
+        return {
+            "title": title,
+            "content": content,
+            "pictures_urls": [u for u in record.get("pictures_urls") or [] if u],
+            "source": source,
+        }
+
+    def signature(self, text: str) -> np.ndarray:
+        words = WORD_PATTERN.findall(text.lower())
+        shingles = {" ".join(words[i : i + 3]) for i in range(max(len(words) - 2, 1))}
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest())
+                % MERSENNE_PRIME
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME).min(
+            axis=1
+        )
+
+    def __iter__(self) -> Iterator[dict]:
+        seen = set()
+        buckets = {}
+        signatures = []
+        rows = self.num_perm // self.bands
+        self.duplicates = 0
+
+        for file_path in self.files():
+            source = os.path.basename(file_path)
+            for record in self.iter_file(file_path):
+                record = self.normalize(record, source)
+                if record is None:
+                    continue
+                if not self.dedup:
+                    yield record
+                    continue
+
+                text = record["title"] + "\n" + record["content"]
+                digest = hashlib.sha256(text.encode("utf-8")).digest()
+                if digest in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(digest)
+
+                signature = self.signature(text)
+                keys = [
+                    (band, signature[band * rows : (band + 1) * rows].tobytes())
+                    for band in range(self.bands)
+                ]
+                candidates = {c for key in keys for c in buckets.get(key, ())}
+                if any(
+                    np.mean(signatures[c] == signature) >= self.threshold
+                    for c in candidates
+                ):
+                    self.duplicates += 1
+                    continue
+
+                for key in keys:
+                    buckets.setdefault(key, []).append(len(signatures))
+                signatures.append(signature)
+                yield record
@@ -0,0 +1,64 @@
+import os
+
+import torch
+import torch.distributed as dist
+
+
+def is_distributed() -> bool:
+    return int(os.environ.get("WORLD_SIZE", "1")) > 1
+
+
+def setup() -> tuple[int, int]:
+    # torchrun sets RANK/WORLD_SIZE/MASTER_ADDR; gloo is the CPU backend
+    if is_distributed() and not dist.is_initialized():
+        dist.init_process_group("gloo")
+        local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", "1"))
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world_size))
+    return rank(), world_size()
+
+
+def rank() -> int:
+    return dist.get_rank() if dist.is_initialized() else 0
+
+
+def world_size() -> int:
+    return dist.get_world_size() if dist.is_initialized() else 1
+
+
+def is_main() -> bool:
+    return rank() == 0
+
+
+def barrier() -> None:
+    if dist.is_initialized():
+        dist.barrier()
+
+
+def broadcast(obj):
+    if not dist.is_initialized():
+        return obj
+    objects = [obj]
+    dist.broadcast_object_list(objects, src=0)
+    return objects[0]
+
+
+def gather(obj) -> list | None:
+    # every rank's obj in rank order on rank 0, None on the other ranks
+    if not dist.is_initialized():
+        return [obj]
+    objects = [None] * world_size() if rank() == 0 else None
+    dist.gather_object(obj, objects, dst=0)
+    return objects
+
+
+def all_reduce_mean(value: float) -> float:
+    if not dist.is_initialized():
+        return value
+    tensor = torch.tensor([value], dtype=torch.float64)
+    dist.all_reduce(tensor)
+    return tensor.item() / world_size()
+
+
+def cleanup() -> None:
+    if dist.is_initialized():
+        dist.destroy_process_group()
@@ -1,46 +1,148 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from PIL import Image
+from itertools import islice
+import os
+
+from PIL import Image, ImageOps
+import torch
 from torch.utils.data import Dataset
 from torchvision import transforms
 
+from src.commons.bucketing import nearest_bucket
+from src.commons.image_store import ImageStore
+from src.commons.latent_cache import LatentCache
+from src.commons.request_manager import RequestManager
+from src.commons.response_cache import ResponseCache
+
 
 class ImageDataset(Dataset):
-    def __init__(self, dataset, tokenizer, image_size=512):
+    # With buckets (a list of (width, height)), each picture is resized and
+    # center-cropped to the bucket closest to its aspect ratio instead of
+    # being squashed to image_size x image_size; sizes[i] is its bucket.
+    def __init__(
+        self,
+        dataset,
+        tokenizer,
+        image_size=512,
+        num_workers=8,
+        cache_dir=".cache/images",
+        store_dir=".cache/image_store",
+        buckets=None,
+    ):
         self.dataset = dataset
         self.tokenizer = tokenizer
         self.image_size = image_size
+        self.num_workers = num_workers
+        self.buckets = buckets
+        self.cache = ResponseCache(cache_dir, max_bytes=4 * 1024**3)
+        if buckets is None:
+            self.stores = {
+                (image_size, image_size): ImageStore(
+                    os.path.join(store_dir, str(image_size)), image_size
+                )
+            }
+        else:
+            self.stores = {
+                (width, height): ImageStore(
+                    os.path.join(store_dir, f"{width}x{height}"), (height, width)
+                )
+                for width, height in buckets
+            }
 
         self.preprocess = transforms.Compose(
             [
                 transforms.Resize((image_size, image_size)),
-                transforms.ToTensor(),
-                transforms.Normalize([0.5], [0.5]),
+                transforms.PILToTensor(),
             ]
         )
 
-        self.images = []
+        self.urls = []
         self.prompts = []
+        self.sizes = []
 
         self._load_images()
 
-    def _load_images(self):
+    def _fetch_image(self, url: str) -> bytes | None:
+        entry = self.cache.get(url)
+        if entry is not None:
+            content = self.cache.read(entry["sha"])
+            if content is not None:
+                return content
+        if self.cache.is_failed(url):
+            return None
+        try:
+            content = RequestManager.fetch(url).content
+        except Exception as e:
+            print(f"[WARNING] Failed to load image: {url} — {e}")
+            self.cache.mark_failed(url, str(e))
+            return None
+        self.cache.put(url, content)
+        return content
+
+    def _load_image(self, url: str):
+        content = self._fetch_image(url)
+        if content is None:
+            return None
+        try:
+            img = Image.open(BytesIO(content)).convert("RGB")
+            if self.buckets is None:
+                return (self.image_size, self.image_size), self.preprocess(img).numpy()
+            size = nearest_bucket(img.width, img.height, self.buckets)
+            img = ImageOps.fit(img, size, method=Image.Resampling.BICUBIC)
+            return size, transforms.functional.pil_to_tensor(img).numpy()
+        except Exception as e:
+            print(f"[WARNING] Failed to decode image: {url} — {e}")
+            self.cache.mark_failed(url, str(e))
+            return None
+
+    def _load_images(self, batch_size=32):
+        jobs = []
         for item in self.dataset:
-            prompt = item["title"] + " " + item["content"]
             if "pictures_urls" not in item:
                 continue
-            for url in item["pictures_urls"]:
-                try:
-                    response = requests.get(url, timeout=10)
-                    img = Image.open(BytesIO(response.content)).convert("RGB")
-                    img = self.preprocess(img)
-                    self.images.append(img)
-                    self.prompts.append(prompt)
-                except Exception as e:
-                    print(f"[WARNING] Failed to load image: {url} — {e}")
+            prompt = item["title"] + " " + item["content"]
+            jobs.extend((url, prompt) for url in item["pictures_urls"] if url)
+
+        missing = list(
+            dict.fromkeys(
+                url
+                for url, _ in jobs
+                if not any(url in store for store in self.stores.values())
+                and not self.cache.is_failed(url)
+            )
+        )
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+                loaded = zip(missing, pool.map(self._load_image, missing))
+                while batch := list(islice(loaded, batch_size)):
+                    by_size = {}
+                    for url, result in batch:
+                        if result is not None:
+                            by_size.setdefault(result[0], []).append((url, result[1]))
+                    for size, items in by_size.items():
+                        self.stores[size].append(items)
+            self.cache.flush()
+
+        stored = {
+            url: size for size, store in self.stores.items() for url in store.rows
+        }
+        for url, prompt in jobs:
+            if url in stored:
+                self.urls.append(url)
+                self.prompts.append(prompt)
+                self.sizes.append(stored[url])
+
+    def row(self, idx):
+        return self.stores[self.sizes[idx]].row(self.urls[idx])
+
+    def image_key(self, idx) -> str:
+        return LatentCache.key(self.row(idx).tobytes())
+
+    def prompt_key(self, idx) -> str:
+        return LatentCache.key(self.prompts[idx])
 
     def __len__(self):
-        return len(self.images)
+        return len(self.urls)
 
     def __getitem__(self, idx):
         text_inputs = self.tokenizer(
@@ -51,8 +153,10 @@ class ImageDataset(Dataset):
             return_tensors="pt",
         )
 
+        pixels = torch.from_numpy(self.row(idx))
+
         return {
-            "pixel_values": self.images[idx],
+            "pixel_values": pixels.float().div_(127.5).sub_(1.0),
             "input_ids": text_inputs.input_ids[0],
             "attention_mask": text_inputs.attention_mask[0],
         }
@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+
+
+class ImageStore:
+    # Append-only uint8 store of preprocessed images: one fixed-size
+    # (3, height, width) row per URL in images.u8, read back through
+    # np.memmap. image_size is an int for square rows or (height, width).
+    def __init__(self, path: str, image_size: int | tuple):
+        self.path = path
+        self.image_size = (
+            image_size if isinstance(image_size, int) else tuple(image_size)
+        )
+        if isinstance(image_size, int):
+            self.height = self.width = image_size
+        else:
+            self.height, self.width = image_size
+        self.data_path = os.path.join(path, "images.u8")
+        self.index_path = os.path.join(path, "index.json")
+        self.rows = {}
+        self._images = None
+        os.makedirs(path, exist_ok=True)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                index = json.load(file)
+            stored = index["image_size"]
+            if (
+                stored if isinstance(stored, int) else tuple(stored)
+            ) == self.image_size:
+                self.rows = index["rows"]
+        self._truncate()
+
+    @property
+    def shape(self) -> tuple:
+        return 3, self.height, self.width
+
+    @property
+    def row_bytes(self) -> int:
+        return 3 * self.height * self.width
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.rows
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def _truncate(self) -> None:
+        # drop rows written by a crashed build that never made it to the index
+        expected = len(self.rows) * self.row_bytes
+        if not os.path.exists(self.data_path):
+            open(self.data_path, "wb").close()
+        if os.path.getsize(self.data_path) != expected:
+            with open(self.data_path, "r+b") as file:
+                file.truncate(expected)
+
+    def append(self, items) -> None:
+        # items: iterable of (url, uint8 array shaped like self.shape)
+        with open(self.data_path, "ab") as file:
+            for url, pixels in items:
+                pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+                if pixels.shape != self.shape:
+                    raise ValueError(f"expected {self.shape}, got {pixels.shape}")
+                file.write(pixels.tobytes())
+                self.rows[url] = len(self.rows)
+        self._images = None
+        self.save()
+
+    def save(self) -> None:
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"image_size": self.image_size, "rows": self.rows}, file)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def images(self) -> np.ndarray:
+        if self._images is None and self.rows:
+            # copy-on-write mapping: writable for torch.from_numpy, never
+            # written back, and pages are shared across DataLoader workers
+            self._images = np.memmap(
+                self.data_path,
+                dtype=np.uint8,
+                mode="c",
+                shape=(len(self.rows),) + self.shape,
+            )
+        return self._images
+
+    def row(self, url: str) -> np.ndarray:
+        return self.images[self.rows[url]]
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from src.commons.data_manager import DataManager
+
+# torch/diffusers are imported inside the worker-side functions: the app
+# process only submits jobs and must not pay for those imports at startup
+
+SCHEDULERS = {
+    "pndm": "PNDMScheduler",
+    "dpm": "DPMSolverMultistepScheduler",
+    "euler": "EulerDiscreteScheduler",
+    "ddim": "DDIMScheduler",
+}
+
+_pipeline = None
+_precision = "fp32"
+_schedulers = {}
+
+
+def load_image_pipeline(image_output_dir: str):
+    import torch
+    from diffusers import StableDiffusionPipeline, UNet2DConditionModel
+
+    base_model = "runwayml/stable-diffusion-v1-5"
+
+    lora_path = os.path.join(image_output_dir, "pytorch_lora_weights.safetensors")
+    if os.path.exists(lora_path):
+        pipe = StableDiffusionPipeline.from_pretrained(
+            base_model, torch_dtype=torch.float32
+        )
+        pipe.load_lora_weights(image_output_dir)
+    else:
+        # build the pipeline around the fine-tuned UNet so the stock one is
+        # never loaded; safetensors files are memory-mapped while loading,
+        # older .bin checkpoints go through torch.load
+        unet_dir = os.path.join(image_output_dir, "unet")
+        unet = UNet2DConditionModel.from_pretrained(
+            unet_dir,
+            torch_dtype=torch.float32,
+            use_safetensors=any(
+                name.endswith(".safetensors") for name in os.listdir(unet_dir)
+            ),
+        )
+        pipe = StableDiffusionPipeline.from_pretrained(
+            base_model, unet=unet, torch_dtype=torch.float32
+        )
+
+    device = "cpu"
+    pipe.to(device)
+    return pipe
+
+
+def _init_worker(image_output_dir: str, precision: str) -> None:
+    from src.commons.precision import channels_last, resolve
+
+    global _pipeline, _precision
+    _pipeline = load_image_pipeline(image_output_dir)
+    _precision = resolve(precision)
+    channels_last(_pipeline.unet, _pipeline.vae)
+    _schedulers["pndm"] = _pipeline.scheduler
+
+
+def _warmup() -> None:
+    pass
+
+
+def _generate(job: dict, out_path: str) -> str:
+    import diffusers
+    import torch
+
+    from src.commons.precision import autocast
+
+    name = job["scheduler"]
+    if name not in _schedulers:
+        scheduler_class = getattr(diffusers, SCHEDULERS[name])
+        _schedulers[name] = scheduler_class.from_config(_pipeline.scheduler.config)
+    _pipeline.scheduler = _schedulers[name]
+
+    generator = torch.Generator().manual_seed(job["seed"])
+    with autocast(_precision):
+        image = _pipeline(
+            job["prompt"], num_inference_steps=job["steps"], generator=generator
+        ).images[0]
+
+    tmp_path = f"{out_path}.tmp.png"
+    image.save(tmp_path)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class ImageWorker:
+    # Stable Diffusion runs in a separate process; the chat turn only
+    # submits a job and polls it. Finished images are cached on disk by
+    # model + prompt + seed + settings. configure() switches model or
+    # precision by replacing the process pool, so at most one pipeline is
+    # ever loaded.
+    def __init__(
+        self,
+        image_output_dir: str = None,
+        cache_dir: str = ".cache/generated",
+        max_workers: int = 1,
+        precision: str = "fp32",
+    ):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.image_output_dir = None
+        self.precision = None
+        self.pool = None
+        DataManager.create_directory(cache_dir)
+        self.jobs = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        if image_output_dir is not None:
+            self.configure(image_output_dir, precision)
+
+    def configure(self, image_output_dir: str, precision: str = "fp32") -> bool:
+        # True when the pool was (re)started
+        with self._lock:
+            if (image_output_dir, precision) == (self.image_output_dir, self.precision):
+                return False
+            old_pool = self.pool
+            self.image_output_dir = image_output_dir
+            self.precision = precision
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(image_output_dir, precision),
+            )
+            # jobs of the previous model are cancelled; their finished images
+            # stay in the cache
+            self.jobs = {}
+        if old_pool is not None:
+            old_pool.shutdown(wait=False, cancel_futures=True)
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self.pool = self.pool, None
+            self.image_output_dir = self.precision = None
+            self.jobs = {}
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def warmup(self):
+        # starts the worker process, which loads the pipeline in its
+        # initializer, before the first prompt arrives
+        return self.pool.submit(_warmup)
+
+    def key(self, job: dict) -> str:
+        payload = json.dumps(
+            {"model": self.image_output_dir, "precision": self.precision, **job},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def submit(self, prompt: str, seed: int = 0, steps: int = 20, scheduler="dpm"):
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"unknown scheduler {scheduler!r}")
+        job = {"prompt": prompt, "seed": seed, "steps": steps, "scheduler": scheduler}
+        with self._lock:
+            key = self.key(job)
+            future = self.jobs.get(key)
+            # a failed or cancelled job is replaced by a new attempt
+            if future is not None and future.done() and self._failure(future):
+                future = None
+            if future is None and not os.path.exists(self.path(key)):
+                self.errors.pop(key, None)
+                self.jobs[key] = self.pool.submit(_generate, job, self.path(key))
+        return key
+
+    @staticmethod
+    def _failure(future) -> BaseException | None:
+        if future.cancelled():
+            return CancelledError()
+        return future.exception()
+
+    def status(self, key: str) -> tuple:
+        if os.path.exists(self.path(key)):
+            return "done", self.path(key)
+        with self._lock:
+            future = self.jobs.get(key)
+            if future is None:
+                if key in self.errors:
+                    return "failed", self.errors[key]
+                return "missing", None
+            if not future.done():
+                return "pending", None
+            error = self._failure(future)
+            if error is not None:
+                # keep only the message, not the future and its traceback
+                del self.jobs[key]
+                if isinstance(error, CancelledError):
+                    return "missing", None
+                self.errors[key] = str(error)
+                return "failed", self.errors[key]
+            self.jobs.pop(key)
+        return "done", future.result()
@@ -0,0 +1,22 @@
+import requests
+
+
+class InferenceClient:
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def health(self) -> dict:
+        response = self.session.get(f"{self.url}/health", timeout=5)
+        response.raise_for_status()
+        return response.json()
+
+    def generate(self, prompt: str, **settings) -> str:
+        response = self.session.post(
+            f"{self.url}/generate",
+            json={"prompt": prompt, "timeout": self.timeout, **settings},
+            timeout=self.timeout + 5,
+        )
+        response.raise_for_status()
+        return response.json()["text"]
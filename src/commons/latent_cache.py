@@ -0,0 +1,84 @@
+import hashlib
+import os
+
+import torch
+from torch.utils.data import Dataset
+
+
+class LatentShards:
+    # One file per key under path/<key[:2]>/<key>.pt. Reads are memory-mapped,
+    # so only the entries a batch touches are paged in, and a write adds one
+    # file without rewriting the others.
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.pt")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._file_path(key))
+
+    def __getitem__(self, key: str) -> torch.Tensor:
+        return torch.load(
+            self._file_path(key), map_location="cpu", mmap=True, weights_only=True
+        )
+
+    def __setitem__(self, key: str, value: torch.Tensor) -> None:
+        file_path = self._file_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        # clone: a view would save its whole base storage
+        torch.save(value.clone(), tmp_path)
+        os.replace(tmp_path, file_path)
+
+
+class LatentCache:
+    # Frozen-encoder outputs keyed by content hash: VAE latent distribution
+    # parameters per image and text-encoder hidden states per prompt.
+    def __init__(self, path: str):
+        self.path = path
+        self.latents = LatentShards(os.path.join(path, "latents"))
+        self.text = LatentShards(os.path.join(path, "text"))
+
+    @staticmethod
+    def key(data) -> str:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def has(self, image_key: str, prompt_key: str) -> bool:
+        return image_key in self.latents and prompt_key in self.text
+
+    def put(
+        self,
+        image_key: str,
+        prompt_key: str,
+        parameters: torch.Tensor,
+        encoder_hidden_states: torch.Tensor,
+    ) -> None:
+        self.latents[image_key] = parameters
+        self.text[prompt_key] = encoder_hidden_states
+
+
+class LatentDataset(Dataset):
+    def __init__(
+        self,
+        cache: LatentCache,
+        image_keys: list,
+        prompt_keys: list,
+        sizes: list | None = None,
+    ):
+        self.cache = cache
+        self.image_keys = image_keys
+        self.prompt_keys = prompt_keys
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.image_keys)
+
+    def __getitem__(self, idx):
+        return {
+            "latent_parameters": self.cache.latents[self.image_keys[idx]],
+            "encoder_hidden_states": self.cache.text[self.prompt_keys[idx]],
+        }
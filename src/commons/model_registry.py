@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+from src.commons.data_manager import DataManager
+
+
+class ModelRegistry:
+    # models/registry.json, written by the trainers on save. Readers only
+    # re-parse it when its mtime changes, so latest() is one stat per call.
+    def __init__(self, base_path: str = "./models"):
+        self.base_path = base_path
+        self.manifest_path = os.path.join(base_path, "registry.json")
+        self.lock_path = os.path.join(base_path, "registry.lock")
+        self.entries = []
+        self._mtime = None
+        self._fallback = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            while chunk := file.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def model_files(path: str):
+        # the files that make up the model; training checkpoints saved next
+        # to it (checkpoint-*/, checkpoints/) are not part of it
+        for root, dir_names, file_names in os.walk(path):
+            dir_names[:] = sorted(
+                d for d in dir_names if not d.startswith("checkpoint")
+            )
+            for file_name in sorted(file_names):
+                yield os.path.join(root, file_name)
+
+    @contextmanager
+    def _manifest_lock(self):
+        # trainers and sweeps in other processes may register concurrently
+        DataManager.create_directory(self.base_path)
+        with self._lock, open(self.lock_path, "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def refresh(self) -> bool:
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            self.entries = (
+                DataManager.load_json(self.manifest_path) if mtime is not None else []
+            )
+            return True
+
+    def register(self, path: str, kind: str, metrics: dict = None) -> dict:
+        files = {
+            os.path.relpath(file_path, path): self.hash_file(file_path)
+            for file_path in self.model_files(path)
+        }
+        entry = {
+            "path": path,
+            "kind": kind,
+            "created": time.time(),
+            "metrics": metrics or {},
+            "files": files,
+        }
+        with self._manifest_lock():
+            # re-read under the lock so no concurrent registration is lost;
+            # save_json replaces the manifest atomically
+            entries = (
+                DataManager.load_json(self.manifest_path)
+                if os.path.exists(self.manifest_path)
+                else []
+            )
+            entries = [e for e in entries if e["path"] != path] + [entry]
+            DataManager.save_json(entries, self.manifest_path)
+            self.entries = entries
+            self._mtime = os.stat(self.manifest_path).st_mtime_ns
+        return entry
+
+    def latest(self, kind: str) -> dict | None:
+        self.refresh()
+        for entry in reversed(self.entries):
+            if entry["kind"] == kind and os.path.isdir(entry["path"]):
+                return entry
+        return None
+
+    def latest_path(self, kind: str) -> str | None:
+        entry = self.latest(kind)
+        if entry is not None:
+            return entry["path"]
+        # checkpoints saved before the registry existed. The directory scan
+        # is only redone when the manifest or the models directory changes.
+        try:
+            key = (self._mtime, os.stat(self.base_path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+        cached = self._fallback.get(kind)
+        if cached is None or cached[0] != key:
+            path = DataManager.find_latest_directory(self.base_path, contain=kind)
+            cached = self._fallback[kind] = (key, path)
+        return cached[1]
@@ -1,6 +1,9 @@
-from typing import List
+from itertools import islice
+from typing import Dict, Iterable, List
 import re
 
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
 
 class ParserManager:
 
@@ -24,12 +27,142 @@ class ParserManager:
             results.append(text[start_idx:end_idx])
             start_idx = end_idx + end_len
 
-        for item in results.copy():
-            if filter_to_remove and filter_to_remove in item:
-                results.remove(item)
+        if filter_to_remove:
+            results = [item for item in results if filter_to_remove not in item]
 
         return results
 
     @staticmethod
     def strip_tags(s: str) -> str:
-        return re.sub(r"<[^>]+>", "", s).strip()
+        if "<" not in s:
+            return s.strip()
+        return TAG_PATTERN.sub("", s).strip()
+
+
+def between_pattern(start: str, end: str) -> re.Pattern:
+    # start, then everything up to the first end, as an unrolled loop: the
+    # body never contains the first character of end unless the rest of
+    # end does not follow, so the engine never backtracks within a match
+    head = re.escape(end[0])
+    body = f"[^{head}]*"
+    if len(end) > 1:
+        body += f"(?:{head}(?!{re.escape(end[1:])})[^{head}]*)*"
+    return re.compile(f"{re.escape(start)}({body}){re.escape(end)}")
+
+
+def select(found: Iterable[str], filter_to_remove, limit) -> List[str]:
+    # get_between's filter, then a rule's limit on the matches it keeps
+    if filter_to_remove:
+        found = (item for item in found if filter_to_remove not in item)
+    return list(islice(found, limit) if limit else found)
+
+
+class Extractor:
+    # rules: name -> (start, end[, filter_to_remove[, limit]]), same matching
+    # semantics as ParserManager.get_between for each rule. Each rule is one
+    # compiled pattern, so a page costs one scan in C per rule instead of a
+    # find/slice round trip in Python per match.
+    def __init__(self, rules: Dict[str, tuple]):
+        self.rules = {}
+        for name, rule in rules.items():
+            start, end, *rest = rule
+            filter_to_remove = rest[0] if len(rest) > 0 else None
+            limit = rest[1] if len(rest) > 1 else None
+            self.rules[name] = (
+                start,
+                between_pattern(start, end),
+                filter_to_remove,
+                limit,
+            )
+
+    def stream(self, window: int = 16384) -> "ExtractorStream":
+        return ExtractorStream(self.rules, window=window)
+
+    def extract(self, text: str) -> Dict[str, List[str]]:
+        results = {}
+        for name, (_, pattern, filter_to_remove, limit) in self.rules.items():
+            if limit:
+                found = (match[1] for match in pattern.finditer(text))
+            else:
+                found = pattern.findall(text)
+            results[name] = select(found, filter_to_remove, limit)
+        return results
+
+    def extract_iter(
+        self, chunks: Iterable[str], window: int = 16384
+    ) -> Dict[str, List[str]]:
+        stream = self.stream(window=window)
+        for chunk in chunks:
+            stream.feed(chunk)
+        return stream.close()
+
+
+class ExtractorStream:
+    # Runs the extractor over response chunks. A match is only reported once
+    # its end marker has arrived, and then it is the same match the whole
+    # page would give. Each rule remembers where its next match can begin:
+    # the start marker it is waiting to close, or the tail a start marker
+    # may still be cut off in. The buffer keeps only the text after the
+    # earliest of those positions, plus at most window characters that have
+    # not been scanned yet: small chunks are scanned together, so the fixed
+    # cost of a scan is paid once per window rather than once per chunk.
+    def __init__(self, rules: Dict[str, tuple], window: int = 16384):
+        self.rules = rules
+        self.window = window
+        self.buffer = ""
+        self.unscanned = 0
+        self.results = {name: [] for name in rules}
+        self.positions = {name: 0 for name in rules}
+
+    def feed(self, chunk: str) -> None:
+        self.buffer += chunk
+        self.unscanned += len(chunk)
+        if self.unscanned >= self.window:
+            self.scan()
+            self.trim()
+
+    def close(self) -> Dict[str, List[str]]:
+        # like get_between, an unterminated match is dropped
+        self.scan()
+        self.buffer = ""
+        self.positions.clear()
+        return self.results
+
+    def scan(self) -> None:
+        buffer = self.buffer
+        self.unscanned = 0
+        for name, position in list(self.positions.items()):
+            start, pattern, filter_to_remove, limit = self.rules[name]
+            results = self.results[name]
+            matches = pattern.finditer(buffer, position)
+            if limit:
+                # stop at the limit instead of matching the rest of the page
+                for match in matches:
+                    position = match.end()
+                    item = match[1]
+                    if not (filter_to_remove and filter_to_remove in item):
+                        results.append(item)
+                        if len(results) >= limit:
+                            break
+                if len(results) >= limit:
+                    del self.positions[name]
+                    continue
+            else:
+                matches = list(matches)
+                if matches:
+                    position = matches[-1].end()
+                    found = [match[1] for match in matches]
+                    results.extend(select(found, filter_to_remove, None))
+            index = buffer.find(start, position)
+            if index == -1:
+                index = max(position, len(buffer) - len(start) + 1)
+            self.positions[name] = index
+
+    def trim(self) -> None:
+        offset = min(self.positions.values(), default=len(self.buffer))
+        # amortize the copy: only drop the consumed prefix once it dominates
+        if offset <= len(self.buffer) // 2:
+            return
+        self.buffer = self.buffer[offset:]
+        for name in self.positions:
+            self.positions[name] -= offset
@@ -0,0 +1,72 @@
+import contextlib
+
+# torch and transformers are imported inside the functions: the app reads
+# the precision lists at startup, before any model library is loaded
+
+PRECISIONS = ("fp32", "bf16", "int8")
+# dynamic int8 quantization only covers the text models' Linear layers
+IMAGE_PRECISIONS = ("fp32", "bf16")
+
+
+def bf16_supported() -> bool:
+    import torch
+
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def resolve(precision: str) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision {precision!r}, expected {PRECISIONS}")
+    if precision == "bf16" and not bf16_supported():
+        print("[WARNING] bf16 is not supported by this CPU, falling back to fp32")
+        return "fp32"
+    return precision
+
+
+def autocast(precision: str):
+    import torch
+
+    if precision == "bf16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def conv1d_to_linear(model: "torch.nn.Module") -> "torch.nn.Module":
+    # GPT-2 style checkpoints use transformers' Conv1D (weight stored as
+    # in x out), which quantize_dynamic does not recognise.
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for name, module in model.named_children():
+        if isinstance(module, Conv1D):
+            linear = torch.nn.Linear(module.weight.size(0), module.weight.size(1))
+            linear.weight.data = module.weight.data.t().contiguous()
+            linear.bias.data = module.bias.data
+            setattr(model, name, linear)
+        else:
+            conv1d_to_linear(module)
+    return model
+
+
+def prepare_text_model(model: "torch.nn.Module", precision: str) -> "torch.nn.Module":
+    import torch
+
+    precision = resolve(precision)
+    model.eval()
+    if precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(
+            conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8
+        )
+    elif precision == "bf16":
+        model = model.to(torch.bfloat16)
+    return model
+
+
+def channels_last(*modules) -> None:
+    import torch
+
+    for module in modules:
+        module.to(memory_format=torch.channels_last)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.commons.data_manager import DataManager
+
+
+class PromptCache:
+    # Exact-match LRU over (namespace, context, normalised prompt), with an
+    # optional nearest-neighbour fallback over sentence embeddings of earlier
+    # prompts in the same namespace. A namespace pins the model version and
+    # the generation settings; the context (e.g. a digest of the
+    # conversation so far) only narrows exact hits, since it differs on
+    # every turn and would keep similar prompts from ever matching. embed
+    # (text -> normalised vector) can be attached once its model has
+    # loaded; vectors are computed lazily, outside the lock. Thread-safe:
+    # the app shares one instance across all sessions.
+    def __init__(
+        self,
+        path: str | None = None,
+        max_entries: int = 512,
+        ttl: float = 7 * 24 * 3600,
+        threshold: float = 0.95,
+        embed=None,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.embed = embed
+        self.entries = OrderedDict()
+        self.vectors = {}
+        self.stats = {"exact": 0, "semantic": 0, "miss": 0}
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.exists(path):
+            for entry in DataManager.load_json(path):
+                self._insert(entry)
+            self._evict(time.time())
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return " ".join(prompt.lower().split())
+
+    @staticmethod
+    def namespace(**settings) -> str:
+        return json.dumps(settings, sort_keys=True, default=str)
+
+    @staticmethod
+    def history(messages: list) -> str:
+        # digest of the earlier turns, as a context: the same question
+        # means something else in another conversation
+        payload = json.dumps(
+            [(m["role"], m["content"]) for m in messages], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def key(namespace: str, prompt: str, context: str = "") -> str:
+        payload = namespace + "\0" + context + "\0" + prompt
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(
+        self, namespace: str, prompt: str, semantic: bool = True, context: str = ""
+    ) -> tuple:
+        # returns (kind, value) with kind "exact", "semantic" or None
+        prompt = self.normalize(prompt)
+        with self._lock:
+            self._evict(time.time())
+            key = self.key(namespace, prompt, context)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["exact"] += 1
+                return "exact", self.entries[key]["value"]
+            embed = self.embed if semantic else None
+            pending = {}
+            if embed is not None:
+                pending = {
+                    k: e["prompt"]
+                    for k, e in self.entries.items()
+                    if e["namespace"] == namespace and k not in self.vectors
+                }
+
+        if embed is not None:
+            # a slow encoder call must not block the other sessions
+            query = embed(prompt)
+            vectors = {k: embed(p) for k, p in pending.items()}
+            with self._lock:
+                for k, vector in vectors.items():
+                    if k in self.entries:
+                        self.vectors[k] = vector
+                keys = [
+                    k
+                    for k, e in self.entries.items()
+                    if e["namespace"] == namespace and k in self.vectors
+                ]
+                if keys:
+                    scores = np.stack([self.vectors[k] for k in keys]) @ query
+                    best = int(scores.argmax())
+                    if scores[best] >= self.threshold:
+                        self.entries.move_to_end(keys[best])
+                        self.stats["semantic"] += 1
+                        return "semantic", self.entries[keys[best]]["value"]
+
+        with self._lock:
+            self.stats["miss"] += 1
+        return None, None
+
+    def put(self, namespace: str, prompt: str, value, context: str = "") -> None:
+        entry = {
+            "namespace": namespace,
+            "context": context,
+            "prompt": self.normalize(prompt),
+            "value": value,
+            "time": time.time(),
+        }
+        with self._lock:
+            self._insert(entry)
+            self._evict(entry["time"])
+            if self.path is not None:
+                DataManager.create_directory(os.path.dirname(self.path) or ".")
+                DataManager.save_json(list(self.entries.values()), self.path)
+
+    def _insert(self, entry: dict) -> None:
+        key = self.key(entry["namespace"], entry["prompt"], entry.get("context", ""))
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.vectors.pop(key, None)
+
+    def _evict(self, now: float) -> None:
+        expired = [k for k, e in self.entries.items() if now - e["time"] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+            self.vectors.pop(key, None)
+        while len(self.entries) > self.max_entries:
+            key, _ = self.entries.popitem(last=False)
+            self.vectors.pop(key, None)
+
+    @property
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        return (self.stats["exact"] + self.stats["semantic"]) / total if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.hit_rate:.0%} hit rate · {self.stats['exact']} exact · "
+            f"{self.stats['semantic']} similar · {self.stats['miss']} misses · "
+            f"{len(self.entries)} entries"
+        )
@@ -1,10 +1,254 @@
+import codecs
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, TypeVar
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from src.commons.response_cache import ResponseCache
+
+T = TypeVar("T")
+
+
+@dataclass
+class RequestStat:
+    url: str
+    status: int | None
+    elapsed: float
+    attempts: int
+    error: str | None = None
 
 
 class RequestManager:
+    max_workers = 16
+    per_host = 4
+    retries = 3
+    backoff = 0.5
+    timeout = 10
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    stats: List[RequestStat] = []
+    cache: ResponseCache | None = None
+
+    _session = None
+    _lock = threading.Lock()
+    _host_slots: dict = {}
+
+    @classmethod
+    def session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=cls.max_workers, pool_maxsize=cls.max_workers
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def _host_slot(cls, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc
+        with cls._lock:
+            if host not in cls._host_slots:
+                cls._host_slots[host] = threading.BoundedSemaphore(cls.per_host)
+            return cls._host_slots[host]
+
+    @classmethod
+    def fetch(cls, url: str, headers: dict = None, params: dict = None, stream=False):
+        elapsed = 0.0
+        attempts = 0
+        error = None
+        response = None
+        while attempts <= cls.retries:
+            attempts += 1
+            try:
+                with cls._host_slot(url):
+                    start = time.perf_counter()
+                    try:
+                        response = cls.session().get(
+                            url,
+                            headers=headers,
+                            params=params,
+                            timeout=cls.timeout,
+                            stream=stream,
+                        )
+                    finally:
+                        elapsed += time.perf_counter() - start
+                if response.status_code not in cls.retry_statuses:
+                    response.raise_for_status()
+                    error = None
+                    break
+                error = f"HTTP {response.status_code}"
+            except requests.HTTPError as e:
+                error = str(e)
+                break
+            except requests.RequestException as e:
+                error = str(e)
+                response = None
+            if attempts <= cls.retries:
+                time.sleep(cls.backoff * 2 ** (attempts - 1))
+
+        cls.stats.append(
+            RequestStat(
+                url=url,
+                status=response.status_code if response is not None else None,
+                elapsed=elapsed,
+                attempts=attempts,
+                error=error,
+            )
+        )
+        if error is not None:
+            raise requests.RequestException(f"{url}: {error}")
+        return response
+
+    @classmethod
+    def get_content(
+        cls, url: str, headers: dict = None, params: dict = None
+    ) -> tuple[bytes, str | None]:
+        cache = cls.cache if not params else None
+        entry = cache.get(url) if cache is not None else None
+        headers_without_validators = headers
+        if entry is not None:
+            headers = {**ResponseCache.validators(entry), **(headers or {})}
+
+        response = cls.fetch(url, headers=headers, params=params)
+        if entry is not None and response.status_code == 304:
+            content = cache.read(entry["sha"])
+            if content is not None:
+                cache.touch(url)
+                return content, entry["encoding"]
+            # evicted since get(): fetch the body again without validators
+            response = cls.fetch(url, headers=headers_without_validators, params=params)
+
+        encoding = response.encoding or response.apparent_encoding
+        if cache is not None:
+            cache.put(
+                url,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                encoding=encoding,
+            )
+        return response.content, encoding
+
+    @classmethod
+    def get(cls, url: str, headers: dict = None, params: dict = None):
+        content, encoding = cls.get_content(url, headers=headers, params=params)
+        return content.decode(encoding or "utf-8", errors="replace")
+
+    @classmethod
+    def iter_text(
+        cls, url: str, headers: dict = None, params: dict = None, chunk_size=16384
+    ) -> Iterator[str]:
+        # same cache handling as get_content: a 304 replays the cached body,
+        # a fresh body is cached once it has been streamed through
+        cache = cls.cache if not params else None
+        entry = cache.get(url) if cache is not None else None
+        if entry is not None:
+            validated = {**ResponseCache.validators(entry), **(headers or {})}
+            response = cls.fetch(url, headers=validated, params=params, stream=True)
+            if response.status_code == 304:
+                response.close()
+                content = cache.read(entry["sha"])
+                if content is not None:
+                    cache.touch(url)
+                    text = content.decode(
+                        entry["encoding"] or "utf-8", errors="replace"
+                    )
+                    for i in range(0, len(text), chunk_size):
+                        yield text[i : i + chunk_size]
+                    return
+                response = cls.fetch(url, headers=headers, params=params, stream=True)
+        else:
+            response = cls.fetch(url, headers=headers, params=params, stream=True)
+
+        encoding = response.encoding or "utf-8"
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        # the raw body is only kept to fill the cache, and given up once it
+        # outgrows what the cache would store
+        body = bytearray() if cache is not None else None
+        with response:
+            for raw in response.iter_content(chunk_size=chunk_size):
+                if body is not None:
+                    body += raw
+                    if len(body) > cache.max_bytes:
+                        body = None
+                text = decoder.decode(raw)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        if body is not None:
+            cache.put(
+                url,
+                bytes(body),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                encoding=encoding,
+            )
+
+    @classmethod
+    def iter_map(
+        cls, fn: Callable[[str], T], urls: List[str], max_workers: int = None
+    ) -> Iterator[tuple[str, T | None]]:
+        # (url, fn(url) or None when fetching failed) in completion order, so
+        # callers can record each page as soon as it is done
+        def _call(url):
+            try:
+                return fn(url)
+            except requests.RequestException as e:
+                print(f"[WARNING] Failed to fetch: {url} — {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or cls.max_workers) as pool:
+            futures = {pool.submit(_call, url): url for url in urls}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    @classmethod
+    def iter_many(
+        cls,
+        urls: List[str],
+        headers: dict = None,
+        params: dict = None,
+        max_workers: int = None,
+    ) -> Iterator[tuple[str, str | None]]:
+        return cls.iter_map(
+            lambda url: cls.get(url, headers=headers, params=params),
+            urls,
+            max_workers=max_workers,
+        )
+
+    @classmethod
+    def get_many(
+        cls,
+        urls: List[str],
+        headers: dict = None,
+        params: dict = None,
+        max_workers: int = None,
+    ) -> List[str | None]:
+        pages = dict(
+            cls.iter_many(urls, headers=headers, params=params, max_workers=max_workers)
+        )
+        return [pages[url] for url in urls]
 
-    @staticmethod
-    def get(url: str, headers: dict = None, params: dict = None):
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.text
+    @classmethod
+    def summary(cls) -> dict:
+        if not cls.stats:
+            return {"requests": 0}
+        elapsed = sorted(s.elapsed for s in cls.stats)
+        return {
+            "requests": len(elapsed),
+            "failed": sum(1 for s in cls.stats if s.error is not None),
+            "retries": sum(s.attempts - 1 for s in cls.stats),
+            "total_s": round(sum(elapsed), 3),
+            "p50_s": round(elapsed[len(elapsed) // 2], 3),
+            "max_s": round(elapsed[-1], 3),
+        }
@@ -0,0 +1,23 @@
+import resource
+import sys
+
+import torch
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024**2 if sys.platform == "darwin" else 1024)
+
+
+def tensor_mb(tensors) -> float:
+    return sum(t.numel() * t.element_size() for t in tensors) / 1024**2
+
+
+def optimizer_state_mb(optimizer: torch.optim.Optimizer) -> float:
+    return tensor_mb(
+        value
+        for state in optimizer.state.values()
+        for value in state.values()
+        if torch.is_tensor(value)
+    )
@@ -0,0 +1,157 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = ".cache/http",
+        max_bytes: int = 512 * 1024**2,
+        failed_ttl: float = 7 * 24 * 3600,
+        save_interval: float = 5.0,
+    ):
+        # the index is written at most every save_interval seconds and at
+        # exit; a crash loses only the latest entries, never the bodies
+        self.path = path
+        self.max_bytes = max_bytes
+        self.failed_ttl = failed_ttl
+        self.save_interval = save_interval
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.index_path = os.path.join(path, "index.json")
+        self.failed_path = os.path.join(path, "failed.json")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(path, "objects"), exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                self.index = json.load(file)
+        self.failed = {}
+        if os.path.exists(self.failed_path):
+            with open(self.failed_path, "r") as file:
+                self.failed = json.load(file)
+        atexit.register(self.flush)
+
+    def _object_path(self, sha: str) -> str:
+        return os.path.join(self.path, "objects", sha[:2], sha)
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            entry = self.index.get(url)
+            if entry is None or not os.path.exists(self._object_path(entry["sha"])):
+                return None
+            return dict(entry)
+
+    @staticmethod
+    def validators(entry: dict) -> dict:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, sha: str) -> bytes | None:
+        # None when the body was evicted after get(): treat it as a miss
+        try:
+            with open(self._object_path(sha), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(
+        self,
+        url: str,
+        body: bytes,
+        etag: str = None,
+        last_modified: str = None,
+        encoding: str = None,
+    ) -> str | None:
+        # a body larger than the whole cache would evict itself on the spot:
+        # skip it, and forget any older entry so it is not revalidated
+        if len(body) > self.max_bytes:
+            with self._lock:
+                if self.index.pop(url, None) is not None:
+                    self._save()
+            return None
+        sha = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(sha)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(body)
+            os.replace(tmp_path, object_path)
+
+        with self._lock:
+            self.failed.pop(url, None)
+            self.index[url] = {
+                "sha": sha,
+                "size": len(body),
+                "etag": etag,
+                "last_modified": last_modified,
+                "encoding": encoding,
+                "used": time.time(),
+            }
+            self._evict()
+            self._save()
+        return sha
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            if url in self.index:
+                self.index[url]["used"] = time.time()
+                self._save()
+
+    def is_failed(self, url: str) -> bool:
+        entry = self.failed.get(url)
+        return entry is not None and time.time() - entry["at"] < self.failed_ttl
+
+    def mark_failed(self, url: str, error: str) -> None:
+        with self._lock:
+            self.failed[url] = {"at": time.time(), "error": error}
+            self._write(self.failed_path, self.failed)
+
+    def _evict(self) -> None:
+        sizes = {e["sha"]: e["size"] for e in self.index.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self.index.items(), key=lambda kv: kv[1]["used"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            sha = entry["sha"]
+            if any(e["sha"] == sha for e in self.index.values()):
+                continue
+            total -= sizes[sha]
+            try:
+                os.remove(self._object_path(sha))
+            except FileNotFoundError:
+                pass
+
+    def _save(self) -> None:
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._dirty:
+            self._write(self.index_path, self.index)
+            self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    @staticmethod
+    def _write(file_path: str, data: dict) -> None:
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, file_path)
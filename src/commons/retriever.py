@@ -0,0 +1,193 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from src.commons.data_manager import DataManager
+from src.commons.dataset_loader import DatasetLoader
+
+
+class TextEmbedder:
+    # mean-pooled, L2-normalised sentence embeddings from a small encoder;
+    # multilingual, since the scraped articles are in French
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        batch_size: int = 64,
+        max_length: int = 256,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+
+    def __call__(self, texts: list) -> np.ndarray:
+        vectors = []
+        with torch.inference_mode():
+            for i in range(0, len(texts), self.batch_size):
+                inputs = self.tokenizer(
+                    texts[i : i + self.batch_size],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="pt",
+                )
+                hidden = self.model(**inputs).last_hidden_state
+                mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1)
+                vectors.append(torch.nn.functional.normalize(pooled, dim=-1).numpy())
+        return np.concatenate(vectors).astype(np.float32)
+
+
+class Retriever:
+    # Chunked corpus + embedding matrix persisted under path. At this corpus
+    # size an exact search (one matrix-vector product over normalised
+    # vectors) is well under a millisecond, so there is no ANN structure.
+    # update() re-embeds only the articles whose content changed.
+    def __init__(
+        self,
+        embed,
+        path: str = ".cache/rag",
+        dataset_path: str = "dataset",
+        chunk_words: int = 80,
+        overlap_words: int = 20,
+    ):
+        self.embed = embed
+        self.path = path
+        self.dataset_path = dataset_path
+        self.chunk_words = chunk_words
+        self.overlap_words = overlap_words
+        self.index_path = os.path.join(path, "index.json")
+        self.vectors_path = os.path.join(path, "vectors.npy")
+        self.chunks = []
+        self.vectors = None
+        self.dataset_mtime = 0.0
+        self._lock = threading.Lock()
+        # one update() at a time (the app and a rebuild may both trigger
+        # one); searches only take _lock to swap in the result
+        self._update_lock = threading.Lock()
+        DataManager.create_directory(path)
+
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path):
+            index = DataManager.load_json(self.index_path)
+            if (index["chunk_words"], index["overlap_words"]) == (
+                chunk_words,
+                overlap_words,
+            ):
+                self.chunks = index["chunks"]
+                self.dataset_mtime = index["dataset_mtime"]
+                self.vectors = np.load(self.vectors_path)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def chunk(self, article: dict) -> list:
+        words = article["content"].split()
+        step = self.chunk_words - self.overlap_words
+        passages = []
+        for start in range(0, max(len(words) - self.overlap_words, 1), step):
+            passages.append(" ".join(words[start : start + self.chunk_words]))
+        return passages
+
+    def current_mtime(self) -> float:
+        loader = DatasetLoader(self.dataset_path)
+        return max((os.path.getmtime(f) for f in loader.files()), default=0.0)
+
+    def stale(self) -> bool:
+        return self.vectors is None or self.current_mtime() > self.dataset_mtime
+
+    def update(self) -> dict:
+        with self._update_lock:
+            return self._update()
+
+    def _update(self) -> dict:
+        mtime = self.current_mtime()
+        existing = {}
+        for row, chunk in enumerate(self.chunks):
+            existing.setdefault(chunk["article"], []).append(row)
+
+        chunks, rows, todo = [], [], []
+        for article in DatasetLoader(self.dataset_path):
+            article_id = hashlib.sha256(
+                (article["title"] + "\n" + article["content"]).encode("utf-8")
+            ).hexdigest()
+            if article_id in existing:
+                for row in existing.pop(article_id):
+                    chunks.append(self.chunks[row])
+                    rows.append(row)
+                continue
+            for passage in self.chunk(article):
+                chunks.append(
+                    {
+                        "article": article_id,
+                        "title": article["title"],
+                        "source": article["source"],
+                        "text": passage,
+                    }
+                )
+                rows.append(None)
+                todo.append(len(chunks) - 1)
+
+        new_vectors = (
+            self.embed([chunks[i]["title"] + "\n" + chunks[i]["text"] for i in todo])
+            if todo
+            else None
+        )
+        reference = new_vectors if new_vectors is not None else self.vectors
+        dim = reference.shape[1] if reference is not None else 0
+        vectors = np.empty((len(chunks), dim), dtype=np.float32)
+        for i, row in enumerate(rows):
+            if row is not None:
+                vectors[i] = self.vectors[row]
+        if todo:
+            vectors[todo] = new_vectors
+
+        # update() may run on a background thread while the app searches
+        with self._lock:
+            self.chunks, self.vectors, self.dataset_mtime = chunks, vectors, mtime
+        self.save()
+        return {
+            "chunks": len(chunks),
+            "embedded": len(todo),
+            "removed": sum(len(r) for r in existing.values()),
+        }
+
+    def save(self) -> None:
+        tmp_path = f"{self.vectors_path}.tmp.npy"
+        np.save(tmp_path, self.vectors)
+        os.replace(tmp_path, self.vectors_path)
+        DataManager.save_json(
+            {
+                "chunk_words": self.chunk_words,
+                "overlap_words": self.overlap_words,
+                "dataset_mtime": self.dataset_mtime,
+                "chunks": self.chunks,
+            },
+            self.index_path,
+        )
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.3) -> list:
+        with self._lock:
+            chunks, vectors = self.chunks, self.vectors
+        if not chunks:
+            return []
+        scores = vectors @ self.embed([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**chunks[i], "score": float(scores[i])}
+            for i in top
+            if scores[i] >= min_score
+        ]
+
+    @staticmethod
+    def augment(prompt: str, passages: list) -> str:
+        if not passages:
+            return prompt
+        context = "\n\n".join(f"{p['title']}\n{p['text']}" for p in passages)
+        return f"{context}\n\nQuestion: {prompt}\nAnswer:"
@@ -0,0 +1,39 @@
+import json
+import os
+
+# Reading side of the training metrics, kept free of torch so the
+# dashboard page can import it without loading the training stack.
+
+METRICS_FILE = "metrics.jsonl"
+
+
+def read_metrics(path: str, offset: int = 0) -> tuple[list, int]:
+    # returns the complete records after offset and the offset to resume
+    # from; a partially written last line is left for the next call
+    records = []
+    with open(path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records, offset
+
+
+def find_runs(base_path: str = "./models") -> list:
+    if not os.path.isdir(base_path):
+        return []
+    runs = [
+        os.path.join(base_path, d)
+        for d in os.listdir(base_path)
+        if os.path.exists(os.path.join(base_path, d, METRICS_FILE))
+    ]
+    return sorted(
+        runs,
+        key=lambda d: os.path.getmtime(os.path.join(d, METRICS_FILE)),
+        reverse=True,
+    )
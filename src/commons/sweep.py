@@ -0,0 +1,107 @@
+import itertools
+import os
+import random
+
+
+def sample_configs(space: dict, trials: int | None = None, seed: int = 0) -> list:
+    # space: name -> list of values. The full grid, or `trials` distinct
+    # points drawn from it.
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    if trials is None or trials >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, trials)
+
+
+def cpu_slices(workers: int) -> list:
+    # disjoint CPU sets, one per worker process, covering every CPU: the
+    # first len(cpus) % workers slices get one extra. With more workers
+    # than CPUs, each gets one CPU, shared round-robin.
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    per_worker, extra = divmod(len(cpus), workers)
+    slices = []
+    start = 0
+    for i in range(workers):
+        size = per_worker + (1 if i < extra else 0)
+        slices.append(cpus[start : start + size])
+        start += size
+    return slices
+
+
+def pin_worker(slots) -> None:
+    # process pool initializer: claim one CPU slice for this worker and size
+    # torch's thread pool to it, so trials do not oversubscribe each other
+    cpus = slots.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    os.environ["OMP_NUM_THREADS"] = str(len(cpus))
+
+    import torch
+
+    torch.set_num_threads(len(cpus))
+
+
+class AshaPruner:
+    # Asynchronous successive halving. Rungs sit at min_resource * eta**k
+    # training samples. A trial reaching a rung records its validation loss
+    # there and keeps training only while it is within the best 1/eta of
+    # the losses recorded at that rung so far. Nobody waits for a rung to
+    # fill up, so every worker stays busy. `rungs` and `lock` come from a
+    # multiprocessing Manager and are shared by all trials.
+    def __init__(self, rungs, lock, min_resource: int, reduction_factor: int = 3):
+        self.rungs = rungs
+        self.lock = lock
+        self.min_resource = min_resource
+        self.reduction_factor = reduction_factor
+
+    def rung(self, resource: int) -> int:
+        # highest rung reached with `resource` samples, -1 before the first
+        if resource < self.min_resource:
+            return -1
+        k = 0
+        while self.min_resource * self.reduction_factor ** (k + 1) <= resource:
+            k += 1
+        return k
+
+    def report(self, trial: int, resource: int, loss: float) -> bool:
+        top = self.rung(resource)
+        if top < 0:
+            return True
+        with self.lock:
+            recorded = None
+            for k in range(top + 1):
+                entries = self.rungs.get(k, [])
+                if any(t == trial for t, _ in entries):
+                    continue
+                # proxies only see reassignment, not in-place appends
+                self.rungs[k] = entries + [(trial, loss)]
+                recorded = k
+            if recorded is None:
+                return True
+            losses = sorted(l for _, l in self.rungs[recorded])
+        keep = max(1, len(losses) // self.reduction_factor)
+        return loss <= losses[keep - 1]
+
+
+class TrialReporter:
+    # Per-trial callback for the trainers: keeps the validation history and
+    # answers whether to continue.
+    def __init__(self, pruner: AshaPruner, trial: int):
+        self.pruner = pruner
+        self.trial = trial
+        self.history = []
+        self.pruned = False
+
+    def __call__(self, resource: int, loss: float) -> bool:
+        self.history.append((resource, loss))
+        if not self.pruned and not self.pruner.report(self.trial, resource, loss):
+            self.pruned = True
+        return not self.pruned
+
+    @property
+    def val_loss(self) -> float | None:
+        return self.history[-1][1] if self.history else None
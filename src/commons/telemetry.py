@@ -0,0 +1,67 @@
+import contextlib
+import json
+import os
+import time
+from collections import defaultdict
+
+import torch
+
+from src.commons.resource_usage import peak_rss_mb
+from src.commons.run_metrics import METRICS_FILE
+
+
+class StepTimer:
+    # wall-clock seconds per named section, accumulated until reset()
+    def __init__(self):
+        self.times = defaultdict(float)
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] += time.perf_counter() - start
+
+    def reset(self) -> dict:
+        times, self.times = dict(self.times), defaultdict(float)
+        return times
+
+
+class MetricsLogger:
+    # append-only JSONL, one object per line, flushed as it is written so a
+    # reader (the app dashboard) can tail a run in progress
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._file = open(path, "a")
+
+    def log(self, **record) -> None:
+        record.setdefault("time", time.time())
+        record.setdefault("peak_rss_mb", peak_rss_mb())
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def profiler(trace_dir: str, start: int = 0, steps: int = 0):
+    # torch.profiler over optimizer steps [start, start + steps), or a no-op;
+    # call .step() once per optimizer step either way
+    if not steps:
+        return _NoProfiler()
+    return torch.profiler.profile(
+        activities=[torch.profiler.ProfilerActivity.CPU],
+        schedule=torch.profiler.schedule(
+            wait=max(start - 1, 0), warmup=1 if start else 0, active=steps, repeat=1
+        ),
+        on_trace_ready=torch.profiler.tensorboard_trace_handler(trace_dir),
+        record_shapes=True,
+        profile_memory=True,
+    )
+
+
+class _NoProfiler(contextlib.nullcontext):
+    def step(self) -> None:
+        pass
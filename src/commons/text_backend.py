@@ -0,0 +1,90 @@
+import os
+import shutil
+from dataclasses import dataclass
+
+from src.commons.precision import prepare_text_model
+
+ONNX_DIR = "onnx"
+BACKENDS = ("auto", "onnx", "eager")
+
+
+@dataclass
+class TextBackend:
+    name: str
+    model: object
+    tokenizer: object
+
+
+def onnx_available() -> bool:
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_onnx(model_dir: str, export_dir: str = None) -> str:
+    # decoder with past_key_values inputs/outputs, so generate() feeds one
+    # token per step instead of re-running the whole context. Written to a
+    # temporary directory first, so a failed export leaves no partial onnx/.
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise ImportError("ONNX export needs optimum: uv sync --extra onnx") from e
+    from transformers import AutoTokenizer
+
+    export_dir = export_dir or os.path.join(model_dir, ONNX_DIR)
+    tmp_dir = f"{export_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        model = ORTModelForCausalLM.from_pretrained(
+            model_dir, export=True, use_cache=True
+        )
+        model.save_pretrained(tmp_dir)
+        AutoTokenizer.from_pretrained(model_dir).save_pretrained(tmp_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(export_dir, ignore_errors=True)
+    os.replace(tmp_dir, export_dir)
+    return export_dir
+
+
+def has_export(model_dir: str) -> bool:
+    return os.path.isfile(os.path.join(model_dir, ONNX_DIR, "config.json"))
+
+
+def resolve_backend(model_dir: str, backend: str, precision: str) -> str:
+    # auto takes the exported graph when it exists and can run; the export
+    # is fp32, so bf16/int8 stay on the eager model
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected {BACKENDS}")
+    if backend != "auto":
+        return backend
+    if precision == "fp32" and has_export(model_dir) and onnx_available():
+        return "onnx"
+    return "eager"
+
+
+def load_text_backend(
+    model_dir: str, backend: str = "auto", precision: str = "fp32", export_dir=None
+) -> TextBackend:
+    # export_dir: an export kept outside model_dir (default model_dir/onnx)
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    name = resolve_backend(model_dir, backend, precision)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    if name == "onnx":
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        # onnxruntime applies its full graph optimisation level at load
+        model = ORTModelForCausalLM.from_pretrained(
+            export_dir or os.path.join(model_dir, ONNX_DIR),
+            use_cache=True,
+            provider="CPUExecutionProvider",
+        )
+    else:
+        model = prepare_text_model(
+            AutoModelForCausalLM.from_pretrained(model_dir), precision
+        )
+    return TextBackend(name, model, tokenizer)
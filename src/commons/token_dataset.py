@@ -0,0 +1,64 @@
+from typing import List
+
+import torch
+from torch.utils.data import Dataset
+
+
+class TokenBlockDataset(Dataset):
+    # All examples live in one contiguous (n, block_size) tensor; items are
+    # row views so the collator does a single stack per batch.
+    def __init__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        self.input_ids = input_ids
+        self.attention_mask = attention_mask
+
+    @classmethod
+    def padded(cls, ids: List[List[int]], block_size: int, pad_token_id: int):
+        input_ids = torch.full((len(ids), block_size), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(ids), block_size), dtype=torch.long)
+        for i, row in enumerate(ids):
+            row = row[:block_size]
+            input_ids[i, : len(row)] = torch.tensor(row, dtype=torch.long)
+            attention_mask[i, : len(row)] = 1
+        return cls(input_ids, attention_mask)
+
+    @classmethod
+    def packed(cls, ids: List[List[int]], block_size: int, eos_token_id: int):
+        stream = []
+        for row in ids:
+            stream.extend(row)
+            stream.append(eos_token_id)
+        n_blocks = len(stream) // block_size
+        input_ids = torch.tensor(
+            stream[: n_blocks * block_size], dtype=torch.long
+        ).view(n_blocks, block_size)
+        return cls(input_ids, torch.ones_like(input_ids))
+
+    def save(self, path: str) -> None:
+        torch.save(
+            {"input_ids": self.input_ids, "attention_mask": self.attention_mask}, path
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        # memory-mapped, so processes loading the same file share its pages
+        data = torch.load(path, mmap=True)
+        return cls(data["input_ids"], data["attention_mask"])
+
+    @property
+    def padding_ratio(self) -> float:
+        if self.attention_mask.numel() == 0:
+            return 0.0
+        return 1.0 - self.attention_mask.sum().item() / self.attention_mask.numel()
+
+    @property
+    def num_tokens(self) -> int:
+        return int(self.attention_mask.sum().item())
+
+    def __len__(self):
+        return self.input_ids.size(0)
+
+    def __getitem__(self, idx):
+        return {
+            "input_ids": self.input_ids[idx],
+            "attention_mask": self.attention_mask[idx],
+        }
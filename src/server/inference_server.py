@@ -0,0 +1,238 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from src.commons.model_registry import ModelRegistry
+from src.commons.precision import PRECISIONS, prepare_text_model
+
+
+class Batcher:
+    # Collects requests for up to max_wait seconds (or max_batch_size of
+    # them), groups the ones with identical sampling settings and runs each
+    # group as one left-padded generate() call.
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        max_batch_size=8,
+        max_wait=0.02,
+        max_queue=64,
+        context_tokens=512,
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.context_tokens = context_tokens
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"batches": 0, "requests": 0, "rejected": 0, "expired": 0}
+        # handler threads and the batching thread both update the counters
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, request: dict, timeout: float) -> Future:
+        future = Future()
+        try:
+            self.queue.put_nowait((request, time.monotonic() + timeout, future))
+        except queue.Full:
+            self._count("rejected")
+            raise
+        return future
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def snapshot(self) -> dict:
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _collect(self) -> list:
+        items = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    @staticmethod
+    def _settings(request: dict) -> tuple:
+        return (
+            int(request.get("max_new_tokens", 80)),
+            bool(request.get("do_sample", True)),
+            int(request.get("top_k", 50)),
+            float(request.get("top_p", 0.95)),
+            float(request.get("temperature", 1.0)),
+        )
+
+    def _loop(self) -> None:
+        while True:
+            items = self._collect()
+            now = time.monotonic()
+            groups = {}
+            for request, deadline, future in items:
+                if deadline < now or not future.set_running_or_notify_cancel():
+                    self._count("expired")
+                    continue
+                groups.setdefault(self._settings(request), []).append((request, future))
+            for settings, group in groups.items():
+                try:
+                    texts = self._generate([r["prompt"] for r, _ in group], settings)
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+                for (_, future), text in zip(group, texts):
+                    future.set_result(text)
+                self._count("batches")
+                self._count("requests", len(group))
+
+    def _generate(self, prompts: list, settings: tuple) -> list:
+        max_new_tokens, do_sample, top_k, top_p, temperature = settings
+        self.tokenizer.truncation_side = "left"
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.context_tokens,
+        )
+        with torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=do_sample,
+                top_k=top_k,
+                top_p=top_p,
+                temperature=temperature,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        new_tokens = output[:, inputs["input_ids"].size(1) :]
+        return self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    batcher: Batcher = None
+    model_dir: str = None
+    request_timeout = 60.0
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send(404, {"error": "not found"})
+            return
+        self._send(
+            200,
+            {
+                "model": self.model_dir,
+                "queue": self.batcher.queue.qsize(),
+                **self.batcher.snapshot(),
+            },
+        )
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("body must be a JSON object")
+            prompt = request["prompt"]
+            timeout = float(request.get("timeout", self.request_timeout))
+            # checked here so a bad value fails this request, not the
+            # batching thread
+            Batcher._settings(request)
+        except (ValueError, TypeError, KeyError) as e:
+            self._send(400, {"error": f"bad request: {e}"})
+            return
+        if not isinstance(prompt, str):
+            self._send(400, {"error": "prompt must be a string"})
+            return
+        if not 0 < timeout < float("inf"):
+            self._send(400, {"error": "timeout must be a positive number"})
+            return
+
+        start = time.perf_counter()
+        try:
+            future = self.batcher.submit(request, timeout)
+        except queue.Full:
+            self._send(503, {"error": "server busy"})
+            return
+        try:
+            text = future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            self._send(504, {"error": "timed out"})
+            return
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, {"text": text, "latency": time.perf_counter() - start})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_server(
+    host="127.0.0.1", port=8765, model_dir=None, precision="fp32", **batcher_kwargs
+) -> ThreadingHTTPServer:
+    model_dir = model_dir or ModelRegistry("./models").latest_path("text-model")
+    if model_dir is None:
+        raise FileNotFoundError("no text model found in ./models")
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = prepare_text_model(
+        AutoModelForCausalLM.from_pretrained(model_dir), precision
+    )
+
+    InferenceHandler.batcher = Batcher(model, tokenizer, **batcher_kwargs)
+    InferenceHandler.model_dir = model_dir
+    return ThreadingHTTPServer((host, port), InferenceHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model-dir", default=None)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--precision", default="fp32", choices=PRECISIONS)
+    args = parser.parse_args()
+
+    server = build_server(
+        args.host,
+        args.port,
+        args.model_dir,
+        args.precision,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue,
+    )
+    print(f"Serving {InferenceHandler.model_dir} on http://{args.host}:{args.port}")
+    server.serve_forever()
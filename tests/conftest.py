@@ -0,0 +1,85 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from src.commons.request_manager import RequestManager
+
+
+class StandInServer(ThreadingHTTPServer):
+    # Local stand-in for the scraped sites. Query parameters drive the
+    # response: ?fail=N answers 503 to the first N requests for that path,
+    # ?delay=S sleeps before answering. Pages carry an ETag and revalidate
+    # with 304. Every request is counted, and the peak number of requests
+    # in flight is tracked.
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.active = 0
+        self.peak = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        with server.lock:
+            server.hits[parts.path] = server.hits.get(parts.path, 0) + 1
+            hit = server.hits[parts.path]
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        try:
+            time.sleep(float(query.get("delay", 0)))
+            if hit <= int(query.get("fail", 0)):
+                self.send_response(503)
+                self.end_headers()
+                return
+            etag = f'"{parts.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = f"page {parts.path}".encode()
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def request_manager(monkeypatch):
+    # fresh class-level state: session, per-host slots, stats, no cache
+    monkeypatch.setattr(RequestManager, "_session", None)
+    monkeypatch.setattr(RequestManager, "_host_slots", {})
+    monkeypatch.setattr(RequestManager, "stats", [])
+    monkeypatch.setattr(RequestManager, "cache", None)
+    monkeypatch.setattr(RequestManager, "backoff", 0.05)
+    return RequestManager
@@ -0,0 +1,37 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from src.commons.checkpointer import Checkpointer
+
+
+def rank_state(seed):
+    torch.manual_seed(seed)
+    return Checkpointer.rng_state()
+
+
+def test_each_rank_resumes_its_own_stream(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path))
+    states = [rank_state(0), rank_state(1)]
+    checkpointer.save(10, {"global_step": 10}, rng=states)
+    checkpointer.wait()
+
+    for rank, seed in enumerate([0, 1]):
+        torch.manual_seed(seed)
+        expected = torch.rand(4)
+        torch.manual_seed(123)
+        checkpointer.load(checkpointer.latest(), rank=rank)
+        assert torch.equal(torch.rand(4), expected)
+
+
+def test_missing_rank_keeps_its_stream(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path))
+    checkpointer.save(10, {"global_step": 10})
+    checkpointer.wait()
+
+    torch.manual_seed(123)
+    expected = torch.rand(4)
+    torch.manual_seed(123)
+    state = checkpointer.load(checkpointer.latest(), rank=1)
+    assert len(state["rng"]) == 1
+    assert torch.equal(torch.rand(4), expected)
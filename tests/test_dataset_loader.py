@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from src.commons.dataset_loader import DatasetLoader
+
+ARTICLES = [
+    {"title": "Squat", "content": 'Keep the back straight, "knees" out [1].\n'},
+    {"title": "Développé couché", "content": ["Grip ", "the bar"]},
+    {"title": "", "content": ""},
+    {"title": "Gainage", "content": "Hold {30 s}, then rest", "pictures_urls": []},
+]
+
+
+def write_json(path, name, records):
+    with open(path / name, "w") as file:
+        json.dump(records, file, indent=4)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_chunked_array_matches_json_load(tmp_path, chunk_size):
+    write_json(tmp_path, "articles.json", ARTICLES)
+    loader = DatasetLoader(str(tmp_path), chunk_size=chunk_size)
+
+    assert list(loader.iter_file(str(tmp_path / "articles.json"))) == ARTICLES
+
+
+def test_truncated_array_is_an_error(tmp_path):
+    (tmp_path / "articles.json").write_text(json.dumps(ARTICLES)[:-20])
+    loader = DatasetLoader(str(tmp_path), chunk_size=7)
+
+    with pytest.raises(ValueError):
+        list(loader.iter_file(str(tmp_path / "articles.json")))
+
+
+def test_normalizes_json_and_jsonl(tmp_path):
+    write_json(tmp_path, "a.json", ARTICLES[:2])
+    with open(tmp_path / "b.jsonl", "w") as file:
+        for record in ARTICLES[2:]:
+            file.write(json.dumps(record) + "\n")
+
+    records = list(DatasetLoader(str(tmp_path)))
+
+    assert [(r["title"], r["content"], r["source"]) for r in records] == [
+        ("Squat", 'Keep the back straight, "knees" out [1].', "a.json"),
+        ("Développé couché", "Grip \nthe bar", "a.json"),
+        ("Gainage", "Hold {30 s}, then rest", "b.jsonl"),
+    ]
+
+
+def test_drops_exact_and_near_duplicates(tmp_path):
+    words = " ".join(f"word{i}" for i in range(200))
+    near = words.replace("word100", "other100")
+    write_json(
+        tmp_path,
+        "a.json",
+        [
+            {"title": "One", "content": words},
+            {"title": "Two", "content": "an unrelated article about rowing"},
+        ],
+    )
+    write_json(
+        tmp_path,
+        "b.json",
+        [{"title": "One", "content": words}, {"title": "One", "content": near}],
+    )
+
+    loader = DatasetLoader(str(tmp_path))
+    assert [r["title"] for r in loader] == ["One", "Two"]
+    assert loader.duplicates == 2
+
+    loader = DatasetLoader(str(tmp_path), dedup=False)
+    assert len(list(loader)) == 4
@@ -0,0 +1,38 @@
+import os
+
+from src.commons.data_manager import DataManager
+from src.commons.model_registry import ModelRegistry
+
+
+def test_latest_path_prefers_registered_models(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    (tmp_path / "text-model-old").mkdir()
+    model = tmp_path / "text-model-new"
+    (model / "checkpoint-10").mkdir(parents=True)
+    (model / "model.safetensors").write_bytes(b"weights")
+    (model / "checkpoint-10" / "optimizer.pt").write_bytes(b"state")
+
+    entry = registry.register(str(model), "text-model")
+
+    assert list(entry["files"]) == ["model.safetensors"]
+    assert ModelRegistry(str(tmp_path)).latest_path("text-model") == str(model)
+
+
+def test_unregistered_lookup_is_cached(tmp_path, monkeypatch):
+    registry = ModelRegistry(str(tmp_path))
+    scans = []
+    find_latest_directory = DataManager.find_latest_directory
+
+    def counting(base_path, contain):
+        scans.append(contain)
+        return find_latest_directory(base_path, contain)
+
+    monkeypatch.setattr(DataManager, "find_latest_directory", counting)
+    assert registry.latest_path("image-model") is None
+    assert registry.latest_path("image-model") is None
+    assert len(scans) == 1
+
+    # a new directory changes the models directory mtime
+    os.mkdir(tmp_path / "image-model-finetuned")
+    assert registry.latest_path("image-model") == f"{tmp_path}/image-model-finetuned"
+    assert len(scans) == 2
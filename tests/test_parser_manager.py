@@ -0,0 +1,48 @@
+import random
+
+from src.commons.parser_manager import Extractor, ParserManager
+
+RULES = {
+    "paragraph": ("<p>", "</p>"),
+    "tail": ("p>", "<", "x"),
+    "open": ("<p", "p", None, 3),
+    "quoted": ('"', '"'),
+    "first_tags": ("<", ">", "x", 2),
+}
+
+
+def expected(text):
+    results = {}
+    for name, (start, end, *rest) in RULES.items():
+        found = ParserManager.get_between(text, start, end, *rest[:1])
+        results[name] = found[: rest[1]] if len(rest) > 1 else found
+    return results
+
+
+def test_extractor_matches_get_between():
+    # overlapping markers, limits and filters, with any chunking and scan
+    # window of the stream: each rule must give what get_between gives for it
+    rng = random.Random(0)
+    extractor = Extractor(RULES)
+    pieces = ["<p>", "</p>", "p", "<", "x", '"', " "]
+    for _ in range(2000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 60)))
+        size = rng.randint(1, 7)
+        chunks = [text[i : i + size] for i in range(0, len(text), size)]
+        window = rng.randint(1, 20)
+
+        assert extractor.extract(text) == expected(text)
+        assert extractor.extract_iter(chunks, window=window) == expected(text)
+
+
+def test_stream_keeps_a_bounded_buffer():
+    extractor = Extractor(RULES)
+    stream = extractor.stream(window=1000)
+    page = "<p>paragraph</p>\n" * 10000
+    largest = 0
+    for i in range(0, len(page), 100):
+        stream.feed(page[i : i + 100])
+        largest = max(largest, len(stream.buffer))
+
+    assert stream.close()["paragraph"] == ["paragraph"] * 10000
+    assert largest < 3000
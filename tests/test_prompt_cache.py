@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.commons.prompt_cache import PromptCache
+
+
+def bag_of_words(text):
+    # stand-in encoder: normalised counts over a tiny vocabulary
+    vocabulary = ["squat", "bench", "press", "knees", "back", "how", "to"]
+    words = text.split()
+    vector = np.array([words.count(w) for w in vocabulary], dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def test_exact_hits_need_the_same_context():
+    cache = PromptCache()
+    cache.put("model", "How to squat", "answer", context="turn-1")
+
+    assert cache.lookup("model", "how to  SQUAT", context="turn-1") == (
+        "exact",
+        "answer",
+    )
+    assert cache.lookup("model", "how to squat", context="turn-2") == (None, None)
+    assert cache.lookup("other", "how to squat", context="turn-1") == (None, None)
+
+
+def test_similar_prompts_match_across_contexts():
+    cache = PromptCache(embed=bag_of_words)
+    cache.put("model", "how to squat knees", "answer", context="turn-1")
+
+    assert cache.lookup("model", "squat how to knees", context="turn-7") == (
+        "semantic",
+        "answer",
+    )
+    assert cache.lookup("model", "bench press", context="turn-7") == (None, None)
+    assert cache.lookup("other", "squat how to knees") == (None, None)
+    assert cache.stats == {"exact": 0, "semantic": 1, "miss": 2}
+
+
+def test_encoder_runs_outside_the_lock():
+    calls = []
+
+    def embed(text):
+        calls.append(cache._lock.locked())
+        return bag_of_words(text)
+
+    cache = PromptCache(embed=embed)
+    cache.put("model", "how to squat", "answer")
+    cache.lookup("model", "squat how to")
+
+    assert calls == [False, False]
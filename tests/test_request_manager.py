@@ -0,0 +1,69 @@
+import time
+
+from src.commons.parser_manager import Extractor
+
+
+def test_retries_with_backoff(http_server, request_manager):
+    start = time.perf_counter()
+    text = request_manager.get(f"{http_server.url}/flaky?fail=2")
+    elapsed = time.perf_counter() - start
+
+    assert text == "page /flaky"
+    assert http_server.hits["/flaky"] == 3
+    assert request_manager.stats[-1].attempts == 3
+    # two sleeps: backoff, then 2 * backoff
+    assert elapsed >= 3 * request_manager.backoff
+
+
+def test_gives_up_after_retries(http_server, request_manager, monkeypatch):
+    monkeypatch.setattr(request_manager, "retries", 2)
+    results = request_manager.get_many([f"{http_server.url}/down?fail=100"])
+
+    assert results == [None]
+    assert http_server.hits["/down"] == 3
+    assert request_manager.stats[-1].error == "HTTP 503"
+
+
+def test_per_host_limit(http_server, request_manager, monkeypatch):
+    monkeypatch.setattr(request_manager, "per_host", 2)
+    urls = [f"{http_server.url}/slow-{i}?delay=0.1" for i in range(8)]
+    results = request_manager.get_many(urls, max_workers=8)
+
+    assert all(r is not None for r in results)
+    assert http_server.peak == 2
+
+
+def test_get_many_keeps_input_order(http_server, request_manager):
+    # later URLs answer first
+    urls = [f"{http_server.url}/p{i}?delay={0.05 * (5 - i)}" for i in range(5)]
+    results = request_manager.get_many(urls, max_workers=5)
+
+    assert results == [f"page /p{i}" for i in range(5)]
+
+
+def test_get_many_failure_is_none(http_server, request_manager, monkeypatch):
+    monkeypatch.setattr(request_manager, "retries", 0)
+    urls = [f"{http_server.url}/ok", f"{http_server.url}/bad?fail=1"]
+
+    assert request_manager.get_many(urls) == ["page /ok", None]
+
+
+def test_iter_many_yields_in_completion_order(http_server, request_manager):
+    urls = [f"{http_server.url}/slow?delay=0.3", f"{http_server.url}/fast"]
+    done = [url for url, _ in request_manager.iter_many(urls, max_workers=2)]
+
+    assert done == urls[::-1]
+
+
+def test_iter_map_streams_pages(http_server, request_manager, monkeypatch):
+    monkeypatch.setattr(request_manager, "retries", 0)
+    extractor = Extractor({"path": ("page /", "!")})
+    urls = [f"{http_server.url}/a!", f"{http_server.url}/b?fail=1"]
+
+    def scrap(url):
+        return extractor.extract_iter(request_manager.iter_text(url, chunk_size=2))
+
+    assert dict(request_manager.iter_map(scrap, urls)) == {
+        urls[0]: {"path": ["a"]},
+        urls[1]: None,
+    }
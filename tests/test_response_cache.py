@@ -0,0 +1,64 @@
+import hashlib
+import os
+
+from src.commons.response_cache import ResponseCache
+
+
+def test_revalidates_with_etag(http_server, request_manager, tmp_path):
+    request_manager.cache = ResponseCache(str(tmp_path))
+    url = f"{http_server.url}/article"
+
+    assert request_manager.get(url) == "page /article"
+    assert request_manager.get(url) == "page /article"
+    assert request_manager.stats[-1].status == 304
+
+
+def test_evicted_body_is_a_miss(http_server, request_manager, tmp_path, monkeypatch):
+    cache = request_manager.cache = ResponseCache(str(tmp_path))
+    url = f"{http_server.url}/article"
+    request_manager.get(url)
+
+    # the body disappears between get() and read()
+    entry = cache.get(url)
+    os.remove(cache._object_path(entry["sha"]))
+    monkeypatch.setattr(cache, "get", lambda _: entry)
+
+    assert request_manager.get(url) == "page /article"
+    assert request_manager.stats[-1].status == 200
+
+
+def test_index_is_written_in_batches(tmp_path):
+    cache = ResponseCache(str(tmp_path), save_interval=3600)
+    cache.put("http://example/a", b"a")
+    cache.put("http://example/b", b"b")
+    assert not os.path.exists(cache.index_path)
+
+    cache.flush()
+    assert set(ResponseCache(str(tmp_path)).index) == {
+        "http://example/a",
+        "http://example/b",
+    }
+
+
+def test_streamed_pages_are_cached(http_server, request_manager, tmp_path):
+    request_manager.cache = ResponseCache(str(tmp_path))
+    url = f"{http_server.url}/article"
+
+    assert "".join(request_manager.iter_text(url, chunk_size=3)) == "page /article"
+    assert request_manager.get(url) == "page /article"
+    assert request_manager.stats[-1].status == 304
+    assert "".join(request_manager.iter_text(url, chunk_size=3)) == "page /article"
+    assert request_manager.stats[-1].status == 304
+
+
+def test_oversized_body_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=4)
+    cache.put("http://example/a", b"abc")
+    cache.put("http://example/b", b"abcdef")
+
+    assert cache.get("http://example/a") is not None
+    assert cache.get("http://example/b") is None
+    assert not os.path.exists(cache._object_path(hashlib.sha256(b"abcdef").hexdigest()))
+
+    cache.put("http://example/a", b"abcdef")
+    assert cache.get("http://example/a") is None
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("diffusers")  # benchmarks.tiny_models builds both
+
+from benchmarks.bench_speculative import run
+from benchmarks.tiny_models import tiny_gpt2
+from src.commons.chat_generator import ChatGenerator
+
+
+@pytest.fixture(scope="module")
+def prompts():
+    # repeated spans, so prompt lookup finds n-grams to draft from
+    rng = random.Random(0)
+    prompts = []
+    for _ in range(3):
+        span = [rng.randrange(1, 1000) for _ in range(24)]
+        prompts.append(span * 3)
+    return prompts
+
+
+@pytest.mark.parametrize("mode", ["prompt lookup", "draft model"])
+def test_greedy_speculative_decoding_keeps_the_main_models_tokens(prompts, mode):
+    model = tiny_gpt2(seed=0).eval()
+    if mode == "draft model":
+        chat = ChatGenerator(model, None, assistant_model=tiny_gpt2(seed=1).eval())
+    else:
+        chat = ChatGenerator(model, None, prompt_lookup_tokens=10)
+
+    with torch.inference_mode():
+        expected, _ = run(model, prompts, 16)
+        outputs, _ = run(model, prompts, 16, **chat.speculative_kwargs())
+
+    assert outputs == expected
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from src.commons import sweep
+from src.commons.sweep import AshaPruner, TrialReporter, cpu_slices, sample_configs
+
+
+def pruner():
+    # a plain dict and lock stand in for the Manager proxies
+    return AshaPruner({}, threading.Lock(), min_resource=10, reduction_factor=3)
+
+
+def test_rungs_grow_geometrically():
+    asha = pruner()
+    # samples -> highest rung reached, rungs at 10, 30, 90, ...
+    expected = {0: -1, 9: -1, 10: 0, 29: 0, 30: 1, 89: 1, 90: 2}
+    assert {r: asha.rung(r) for r in expected} == expected
+
+
+def test_keeps_the_best_third_of_each_rung():
+    asha = pruner()
+    # before the first rung every trial continues
+    assert asha.report(0, 5, 9.0)
+    # the first trial at a rung is the best so far
+    assert asha.report(0, 10, 1.0)
+    assert not asha.report(1, 10, 2.0)
+    assert not asha.report(2, 10, 3.0)
+    # a better late arrival is promoted although the rung is full
+    assert asha.report(3, 12, 0.5)
+    assert asha.rungs[0] == [(0, 1.0), (1, 2.0), (2, 3.0), (3, 0.5)]
+
+
+def test_skipped_rungs_are_recorded():
+    asha = pruner()
+    # a first report past two rungs records the loss at both
+    assert asha.report(0, 35, 1.0)
+    assert asha.rungs == {0: [(0, 1.0)], 1: [(0, 1.0)]}
+    # reporting again at the same rung does not add an entry
+    assert asha.report(0, 40, 5.0)
+    assert asha.rungs[1] == [(0, 1.0)]
+
+
+def test_reporter_stays_pruned():
+    asha = pruner()
+    asha.report(0, 10, 1.0)
+    asha.report(1, 10, 1.5)
+    reporter = TrialReporter(asha, trial=2)
+
+    assert not reporter(10, 3.0)
+    # a later good loss does not bring the trial back
+    assert not reporter(30, 0.1)
+    assert reporter.pruned
+    assert reporter.history == [(10, 3.0), (30, 0.1)]
+    assert reporter.val_loss == 0.1
+
+
+@pytest.mark.parametrize(
+    "cpus, workers, expected",
+    [
+        (8, 2, [[0, 1, 2, 3], [4, 5, 6, 7]]),
+        (7, 3, [[0, 1, 2], [3, 4], [5, 6]]),
+        (2, 3, [[0], [1], [0]]),
+    ],
+)
+def test_cpu_slices_cover_every_cpu(monkeypatch, cpus, workers, expected):
+    monkeypatch.setattr(
+        sweep.os, "sched_getaffinity", lambda _: set(range(cpus)), raising=False
+    )
+    assert cpu_slices(workers) == expected
+
+
+def test_sample_configs():
+    space = {"lr": [1, 2, 3], "epochs": [1, 2]}
+    assert len(sample_configs(space)) == 6
+    drawn = sample_configs(space, trials=4, seed=1)
+    assert len(drawn) == 4
+    assert len({tuple(c.items()) for c in drawn}) == 4
+    assert drawn == sample_configs(space, trials=4, seed=1)
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("diffusers")  # benchmarks.tiny_models builds both
+pytest.importorskip("optimum.onnxruntime")
+
+from transformers import GPT2TokenizerFast
+from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+from benchmarks.bench_text_backend import generate
+from benchmarks.tiny_models import tiny_gpt2
+from src.commons.text_backend import export_onnx, load_text_backend
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    # tiny random GPT-2 with a byte-level tokenizer built on the spot, so
+    # nothing is downloaded
+    path = tmp_path_factory.mktemp("model")
+    vocab = {token: i for i, token in enumerate(bytes_to_unicode().values())}
+    vocab["<|endoftext|>"] = len(vocab)
+    (path / "vocab.json").write_text(json.dumps(vocab))
+    (path / "merges.txt").write_text("#version: 0.2\n")
+    GPT2TokenizerFast(
+        vocab_file=str(path / "vocab.json"),
+        merges_file=str(path / "merges.txt"),
+        eos_token="<|endoftext|>",
+    ).save_pretrained(path)
+
+    model = tiny_gpt2(seed=0, vocab_size=len(vocab), n_positions=128)
+    model.config.bos_token_id = model.config.eos_token_id = len(vocab) - 1
+    model.save_pretrained(path)
+    export_onnx(str(path))
+    return str(path)
+
+
+def test_onnx_matches_eager(model_dir):
+    eager = load_text_backend(model_dir, "eager")
+    onnx = load_text_backend(model_dir, "onnx")
+    assert onnx.name == "onnx"
+
+    generator = torch.Generator().manual_seed(0)
+    prompts = [
+        torch.randint(0, 256, (24,), generator=generator).tolist() for _ in range(3)
+    ]
+    with torch.inference_mode():
+        input_ids = torch.tensor(prompts[:1])
+        attention_mask = torch.ones_like(input_ids)
+        reference = eager.model(input_ids, attention_mask=attention_mask).logits
+        logits = onnx.model(input_ids, attention_mask=attention_mask).logits
+        # greedy continuations go through the exported past_key_values path
+        expected, _ = generate(eager.model, prompts, 16)
+        outputs, _ = generate(onnx.model, prompts, 16)
+
+    assert torch.allclose(logits, reference, atol=1e-3)
+    assert outputs == expected
@@ -0,0 +1,18 @@
+import time
+
+from src.commons.retriever import Retriever, TextEmbedder
+
+if __name__ == "__main__":
+    embedder = TextEmbedder()
+    retriever = Retriever(
+        embedder,
+        path=f".cache/rag/{embedder.model_name.replace('/', '--')}",
+    )
+    start = time.perf_counter()
+    print(retriever.update(), f"in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    passages = retriever.search("exercices pour les pectoraux", k=3)
+    print(f"search {(time.perf_counter() - start) * 1000:.1f} ms")
+    for passage in passages:
+        print(f"{passage['score']:.3f} {passage['title']}")
@@ -1,30 +1,36 @@
+from src.commons.crawl_journal import CrawlJournal
 from src.commons.data_manager import DataManager
-from src.commons.parser_manager import ParserManager
+from src.commons.parser_manager import Extractor, ParserManager
 from src.commons.request_manager import RequestManager
+from src.commons.response_cache import ResponseCache
 from typing import List
 
 
 class ScrapperCoachHunter:
 
-    @staticmethod
-    def scrap_article(url: str) -> List[dict]:
+    page_extractor = Extractor({"blocks": ('<div class="exo2">', "</div>")})
+    block_extractor = Extractor(
+        {
+            "title": ("<h4>", "</h4>", None, 1),
+            "content": ('<figcaption class="descEx">', "</figcaption>", None, 1),
+            "image": ('src="', '"', None, 1),
+        }
+    )
+
+    @classmethod
+    def scrap_article(cls, url: str) -> List[dict]:
         articles: List[dict] = []
-        data = RequestManager.get(url) or ""
-        blocks = ParserManager.get_between(data, '<div class="exo2">', "</div>")
-        for b in blocks:
+        # the page goes through the extractor chunk by chunk as it downloads
+        page = cls.page_extractor.extract_iter(RequestManager.iter_text(url))
+        for b in page["blocks"]:
+            parts = cls.block_extractor.extract(b)
             raw_title = ""
-            title_blocks = ParserManager.get_between(b, "<h4>", "</h4>")
-            if title_blocks:
-                raw_title = ParserManager.strip_tags(title_blocks[0])
+            if parts["title"]:
+                raw_title = ParserManager.strip_tags(parts["title"][0])
             content = ""
-            content_blocks = ParserManager.get_between(
-                b, '<figcaption class="descEx">', "</figcaption>"
-            )
-            if content_blocks:
-                content = ParserManager.strip_tags(content_blocks[0])
-
-            images = ParserManager.get_between(b, 'src="', '"')
-            image = images[0] if images else ""
+            if parts["content"]:
+                content = ParserManager.strip_tags(parts["content"][0])
+            image = parts["image"][0] if parts["image"] else ""
 
             if raw_title or content or image:
                 articles.append(
@@ -34,10 +40,22 @@ class ScrapperCoachHunter:
         return articles
 
     def run(self):
-        articles = self.scrap_article("https://www.coach-hunter.com/exercice")
+        urls = ["https://www.coach-hunter.com/exercice"]
+        journal = CrawlJournal("coach_hunter")
+        todo = [url for url in urls if not journal.is_done(url)]
+        # each page is journaled as soon as it is parsed, so a crash
+        # mid-crawl only refetches the pages still in flight
+        for url, blocks in RequestManager.iter_map(self.scrap_article, todo):
+            if blocks is not None:
+                journal.record(url, blocks)
+
+        articles = [a for blocks in journal.results(urls) for a in blocks]
         DataManager.save_json(articles, "dataset/coach_hunter.json")
+        journal.finish()
 
 
 if __name__ == "__main__":
     DataManager.create_directory("dataset")
+    RequestManager.cache = ResponseCache()
     ScrapperCoachHunter().run()
+    print(RequestManager.summary())
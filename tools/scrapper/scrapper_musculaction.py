@@ -1,6 +1,8 @@
+from src.commons.crawl_journal import CrawlJournal
 from src.commons.data_manager import DataManager
-from src.commons.parser_manager import ParserManager
+from src.commons.parser_manager import Extractor, ParserManager
 from src.commons.request_manager import RequestManager
+from src.commons.response_cache import ResponseCache
 
 
 class ScrapperMusculaction:
@@ -16,18 +18,23 @@ class ScrapperMusculaction:
             urls[i] = "https://www.musculaction.com/" + urls[i]
         return urls
 
-    @staticmethod
-    def scrap_article(url: str) -> dict:
-        data = RequestManager.get(url)
-        title_parts = ParserManager.get_between(data, '<h1 class="h1grand">', "</h1>")
-        if not title_parts:
-            title_parts = ParserManager.get_between(data, "<title>", "</title>")
+    article_extractor = Extractor(
+        {
+            "h1": ('<h1 class="h1grand">', "</h1>", None, 1),
+            "title": ("<title>", "</title>", None, 1),
+            "content": ("<p>", "</p>"),
+            "pictures": ('src="images/', '.jpg"', None, 2),
+        }
+    )
+
+    @classmethod
+    def scrap_article(cls, url: str) -> dict:
+        # the page goes through the extractor chunk by chunk as it downloads
+        parts = cls.article_extractor.extract_iter(RequestManager.iter_text(url))
+        title_parts = parts["h1"] or parts["title"]
         title = title_parts[0].strip()
-        content_parts = ParserManager.get_between(data, "<p>", "</p>")
-        for i in range(len(content_parts)):
-            content_parts[i] = ParserManager.strip_tags(content_parts[i])
-        content = "\n".join([p.strip() for p in content_parts])
-        picture_parts = ParserManager.get_between(data, 'src="images/', '.jpg"')
+        content = "\n".join([ParserManager.strip_tags(p) for p in parts["content"]])
+        picture_parts = parts["pictures"]
         picture_url = ""
         if len(picture_parts) >= 2:
             picture_url = (
@@ -38,13 +45,21 @@ class ScrapperMusculaction:
     def run(self):
         urls = self.scrap_link()
 
-        articles = []
-        for url in urls:
-            article = self.scrap_article(url)
-            articles.append(article)
+        journal = CrawlJournal("musculaction")
+        todo = [url for url in urls if not journal.is_done(url)]
+        # each article is journaled as soon as it is parsed, so a crash
+        # mid-crawl only refetches the pages still in flight
+        for url, article in RequestManager.iter_map(self.scrap_article, todo):
+            if article is not None:
+                journal.record(url, article)
+
+        articles = journal.results(urls)
         DataManager.save_json(articles, "dataset/musculaction.json")
+        journal.finish()
 
 
 if __name__ == "__main__":
     DataManager.create_directory("dataset")
+    RequestManager.cache = ResponseCache()
     ScrapperMusculaction().run()
+    print(RequestManager.summary())
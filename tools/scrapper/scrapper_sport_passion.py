@@ -1,6 +1,8 @@
+from src.commons.crawl_journal import CrawlJournal
 from src.commons.data_manager import DataManager
-from src.commons.parser_manager import ParserManager
+from src.commons.parser_manager import Extractor, ParserManager
 from src.commons.request_manager import RequestManager
+from src.commons.response_cache import ResponseCache
 
 
 class ScrapperSportPassion:
@@ -15,31 +17,42 @@ class ScrapperSportPassion:
             urls[i] = "https://www.sport-passion.fr/conseils/" + urls[i] + ".php"
         return urls
 
-    @staticmethod
-    def scrap_article(url: str) -> dict:
-        data = RequestManager.get(url)
-        title = ParserManager.get_between(data, "<title>", "</title>")[0]
-        content_parts = ParserManager.get_between(data, "<p>", "</p>")
-        for i in range(len(content_parts)):
-            content_parts[i] = ParserManager.strip_tags(content_parts[i])
-        content = "\n".join(content_parts)
-        pictures_urls = ParserManager.get_between(
-            data, "pictures/", '"', filter_to_remove="/"
-        )
-        for i in range(len(pictures_urls)):
-            full_pic_url = "https://www.sport-passion.fr/pictures/" + pictures_urls[i]
-            pictures_urls[i] = full_pic_url
+    article_extractor = Extractor(
+        {
+            "title": ("<title>", "</title>", None, 1),
+            "content": ("<p>", "</p>"),
+            "pictures": ("pictures/", '"', "/"),
+        }
+    )
+
+    @classmethod
+    def scrap_article(cls, url: str) -> dict:
+        # the page goes through the extractor chunk by chunk as it downloads
+        parts = cls.article_extractor.extract_iter(RequestManager.iter_text(url))
+        title = parts["title"][0]
+        content = "\n".join([ParserManager.strip_tags(p) for p in parts["content"]])
+        pictures_urls = [
+            "https://www.sport-passion.fr/pictures/" + p for p in parts["pictures"]
+        ]
         return {"title": title, "content": content, "pictures_urls": pictures_urls}
 
     def run(self):
         urls = self.scrap_link()
-        articles = []
-        for url in urls:
-            article = self.scrap_article(url)
-            articles.append(article)
+        journal = CrawlJournal("sport_passion")
+        todo = [url for url in urls if not journal.is_done(url)]
+        # each article is journaled as soon as it is parsed, so a crash
+        # mid-crawl only refetches the pages still in flight
+        for url, article in RequestManager.iter_map(self.scrap_article, todo):
+            if article is not None:
+                journal.record(url, article)
+
+        articles = journal.results(urls)
         DataManager.save_json(articles, "dataset/sport_passion_articles.json")
+        journal.finish()
 
 
 if __name__ == "__main__":
     DataManager.create_directory("dataset")
+    RequestManager.cache = ResponseCache()
     ScrapperSportPassion().run()
+    print(RequestManager.summary())
@@ -0,0 +1,270 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from transformers import TrainerCallback
+
+from src.commons.data_manager import DataManager
+from src.commons.model_registry import ModelRegistry
+from src.commons.precision import resolve
+from src.commons.sweep import (
+    AshaPruner,
+    TrialReporter,
+    cpu_slices,
+    pin_worker,
+    sample_configs,
+)
+from tools.train_image_model import TrainImageModel
+from tools.train_text_model import TrainTextModel
+
+# swept by default; --param adds or replaces entries
+SPACES = {
+    "text": {"lr": [2e-5, 5e-5, 1e-4], "epochs": [3]},
+    "image": {"lr": [5e-6, 1e-5, 2e-5], "epochs": [1]},
+}
+
+
+class SweepCallback(TrainerCallback):
+    # forwards the Trainer's eval_loss to the trial's reporter and stops the
+    # run when the pruner says so
+    def __init__(self, reporter):
+        self.reporter = reporter
+
+    def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+        if not metrics or "eval_loss" not in metrics:
+            return
+        samples = (
+            state.global_step
+            * args.per_device_train_batch_size
+            * args.gradient_accumulation_steps
+        )
+        if not self.reporter(samples, metrics["eval_loss"]):
+            control.should_training_stop = True
+
+
+def prepare_shared(kind, configs, sweep_dir):
+    # work every trial would otherwise repeat: text blocks are tokenized once
+    # and memory-mapped by the trials; images are downloaded, preprocessed
+    # and VAE/text-encoded into the on-disk caches the trials read from
+    if kind == "text":
+        trainer = TrainTextModel()
+        trainer.load_dataset()
+        trainer.load_tokenizer()
+        trainer.tokenize_dataset(pack=True)
+        path = os.path.join(sweep_dir, "blocks.pt")
+        trainer.inputs.save(path)
+        return path
+
+    trainer = TrainImageModel()
+    trainer.load_dataset()
+    trainer.load_model()
+    # every (resolution, bucketing, precision) some trial will train on: the
+    # latent cache is keyed by precision, so each one is encoded up front
+    # rather than inside a trial's timed run
+    settings = {
+        (
+            int(size),
+            config.get("aspect_buckets", True),
+            resolve(config.get("precision", "fp32")),
+        )
+        for config in configs
+        for size in (config.get("resolution_schedule") or {0: 512}).values()
+    }
+    for size, aspect_buckets, precision in sorted(settings):
+        trainer.precision = precision
+        trainer.tokenize_and_prepare_dataset(
+            cache_latents=True, image_size=size, aspect_buckets=aspect_buckets
+        )
+    return None
+
+
+def run_trial(kind, trial, config, trial_dir, shared, pruner, rung_samples):
+    reporter = TrialReporter(pruner, trial)
+    start = time.perf_counter()
+    if kind == "text":
+        batch_size = config.get("batch_size", 2)
+        TrainTextModel().run(
+            **{"num_workers": 0, "export": False, **config},
+            output_dir=trial_dir,
+            dataset_path=shared,
+            eval_steps=max(1, rung_samples // batch_size),
+            callbacks=[SweepCallback(reporter)],
+            register=False,
+        )
+    else:
+        samples_per_step = config.get("batch_size", 2) * config.get(
+            "gradient_accumulation_steps", 1
+        )
+        TrainImageModel().train(
+            **{"num_workers": 0, "checkpoint_every": 0, **config},
+            out_dir=trial_dir,
+            cache_latents=True,
+            validate_every=max(1, rung_samples // samples_per_step),
+            on_validation=reporter,
+            register=False,
+        )
+    return {
+        "trial": trial,
+        "config": config,
+        "val_loss": reporter.val_loss,
+        "history": reporter.history,
+        "pruned": reporter.pruned,
+        "seconds": time.perf_counter() - start,
+        "path": trial_dir,
+    }
+
+
+def parse_param(text):
+    # name=JSON, e.g. lr=[1e-5, 5e-5] or epochs=2
+    name, _, value = text.partition("=")
+    value = json.loads(value)
+    return name, value if isinstance(value, list) else [value]
+
+
+def sweep(
+    kind,
+    space,
+    trials=None,
+    workers=2,
+    rung_samples=64,
+    reduction_factor=3,
+    seed=0,
+    models_dir="./models",
+):
+    configs = sample_configs(space, trials, seed)
+    stamp = time.strftime("%Y-%m-%d-%H-%M")
+    sweep_dir = os.path.join(".cache/sweeps", f"{kind}-{stamp}")
+    DataManager.create_directory(sweep_dir)
+    shared = prepare_shared(kind, configs, sweep_dir)
+    print(f"{len(configs)} trials on {workers} workers")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        pruner = AshaPruner(
+            manager.dict(), manager.Lock(), rung_samples, reduction_factor
+        )
+        slots = manager.Queue()
+        for cpus in cpu_slices(workers):
+            slots.put(cpus)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=pin_worker,
+            initargs=(slots,),
+        ) as pool:
+            futures = {
+                pool.submit(
+                    run_trial,
+                    kind,
+                    trial,
+                    config,
+                    os.path.join(sweep_dir, f"trial-{trial}"),
+                    shared,
+                    pruner,
+                    rung_samples,
+                ): (trial, config)
+                for trial, config in enumerate(configs)
+            }
+            for future in as_completed(futures):
+                trial, config = futures[future]
+                try:
+                    result = future.result()
+                except Exception:
+                    traceback.print_exc()
+                    result = {"trial": trial, "config": config, "error": True}
+                results.append(result)
+                status = (
+                    "failed"
+                    if result.get("error")
+                    else "pruned" if result["pruned"] else "done"
+                )
+                print(
+                    f"trial {trial} {status} {config} val_loss {result.get('val_loss')}"
+                )
+
+    finished = [
+        r
+        for r in results
+        if not r.get("error") and not r["pruned"] and r["val_loss"] is not None
+    ]
+    if not finished:
+        print("No trial finished, nothing saved")
+        return None
+    best = min(finished, key=lambda r: r["val_loss"])
+    print(
+        f"best trial {best['trial']} {best['config']} val_loss {best['val_loss']:.4f}"
+    )
+
+    # the winning run becomes a regular model directory; the other trials
+    # are deleted along with the shared data
+    out_dir = os.path.join(models_dir, f"{kind}-model-sweep_{stamp}")
+    shutil.copytree(best["path"], out_dir, ignore=shutil.ignore_patterns("checkpoint*"))
+    summary = {
+        "best": best,
+        "trials": sorted(results, key=lambda r: r["trial"]),
+        "rung_samples": rung_samples,
+        "reduction_factor": reduction_factor,
+    }
+    DataManager.save_json(summary, os.path.join(out_dir, "sweep.json"))
+    shutil.rmtree(sweep_dir)
+
+    exported = None
+    if kind == "text":
+        from src.commons.text_backend import export_onnx
+
+        try:
+            exported = export_onnx(out_dir)
+        except Exception as e:
+            print(f"[WARNING] Skipping ONNX export: {e}")
+    ModelRegistry(models_dir).register(
+        out_dir,
+        kind=f"{kind}-model",
+        metrics={
+            "val_loss": best["val_loss"],
+            "config": best["config"],
+            "trials": len(configs),
+            "pruned": sum(1 for r in results if r.get("pruned")),
+            "export": exported,
+        },
+    )
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("kind", choices=sorted(SPACES))
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="name=JSON value or list, e.g. 'lr=[1e-5, 5e-5]'",
+    )
+    parser.add_argument("--trials", type=int, default=None, help="default: full grid")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--rung-samples",
+        type=int,
+        default=64,
+        help="training samples before the first pruning decision",
+    )
+    parser.add_argument("--reduction-factor", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    space = dict(SPACES[args.kind])
+    space.update(parse_param(p) for p in args.param)
+    sweep(
+        args.kind,
+        space,
+        trials=args.trials,
+        workers=args.workers,
+        rung_samples=args.rung_samples,
+        reduction_factor=args.reduction_factor,
+        seed=args.seed,
+    )
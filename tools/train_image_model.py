@@ -1,18 +1,40 @@
+import argparse
+import contextlib
+import math
 import os
 import time
 
 from diffusers import StableDiffusionPipeline, DDPMScheduler
+from diffusers.models.autoencoders.vae import DiagonalGaussianDistribution
 from diffusers.optimization import get_scheduler
 import torch
-from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Subset
 
+from src.commons import distributed
+from src.commons.bucketing import BucketBatchSampler, bucket_sizes, dataset_sizes
+from src.commons.checkpointer import Checkpointer
 from src.commons.data_manager import DataManager
+from src.commons.dataset_loader import DatasetLoader
 from src.commons.image_dataset import ImageDataset
+from src.commons.latent_cache import LatentCache, LatentDataset
+from src.commons.model_registry import ModelRegistry
+from src.commons.precision import autocast, channels_last, resolve
+from src.commons.resource_usage import optimizer_state_mb, peak_rss_mb, tensor_mb
+from src.commons.telemetry import METRICS_FILE, MetricsLogger, StepTimer, profiler
 
-import matplotlib.pyplot as plt
+
+def batch_bucket(batch) -> str:
+    # "WxH" of the pixels behind a batch; cached latents are 8x smaller
+    if "pixel_values" in batch:
+        height, width = batch["pixel_values"].shape[-2:]
+    else:
+        height, width = (8 * n for n in batch["latent_parameters"].shape[-2:])
+    return f"{width}x{height}"
 
 
 class TrainImageModel:
+    model_name = "runwayml/stable-diffusion-v1-5"
 
     def __init__(self):
         self.dataset = []
@@ -23,32 +45,252 @@ class TrainImageModel:
         self.pipeline = None
         self.unet = None
         self.noise_scheduler = None
+        self.precision = "fp32"
+        self.lora_rank = 0
+        self.ddp_unet = None
+        self.validation_batches = []
 
     def load_dataset(self):
-        dataset_path = DataManager.ls_directory("dataset")
-        dataset = []
-        for file_name in dataset_path:
-            if file_name.endswith(".json"):
-                data = DataManager.load_json(f"dataset/{file_name}")
-                dataset.extend(data)
-        self.dataset = dataset
+        self.dataset = DatasetLoader("dataset")
 
     def load_model(self):
-        model_name = "runwayml/stable-diffusion-v1-5"
-
         self.pipeline = StableDiffusionPipeline.from_pretrained(
-            model_name, torch_dtype=torch.float32
+            self.model_name, torch_dtype=torch.float32
         )
 
         self.tokenizer = self.pipeline.tokenizer
         self.unet = self.pipeline.unet
         self.noise_scheduler = DDPMScheduler.from_config(self.pipeline.scheduler.config)
 
-    def tokenize_and_prepare_dataset(self):
-        dataset = ImageDataset(self.dataset, self.tokenizer)
+    def precompute_latents(
+        self, dataset, device, batch_size=8, cache_dir=".cache/latents"
+    ):
+        cache = LatentCache(
+            os.path.join(
+                cache_dir,
+                f"{self.model_name.replace('/', '--')}-{self.precision}",
+            )
+        )
+        image_keys = [dataset.image_key(i) for i in range(len(dataset))]
+        prompt_keys = [dataset.prompt_key(i) for i in range(len(dataset))]
+        todo = [
+            i
+            for i in range(len(dataset))
+            if not cache.has(image_keys[i], prompt_keys[i])
+        ]
+
+        if todo:
+            self.pipeline.vae.to(device)
+            self.pipeline.text_encoder.to(device)
+            # same-size batches, in order, mapped back to dataset indices
+            batches = [
+                [todo[i] for i in batch]
+                for batch in BucketBatchSampler(
+                    [dataset.sizes[i] for i in todo], batch_size, shuffle=False
+                )
+            ]
+            loader = DataLoader(dataset, batch_sampler=batches)
+            with torch.no_grad(), autocast(self.precision):
+                for indices, batch in zip(batches, loader):
+                    parameters = self.pipeline.vae.encode(
+                        batch["pixel_values"].to(device)
+                    ).latent_dist.parameters
+                    encoder_hidden_states = self.pipeline.text_encoder(
+                        input_ids=batch["input_ids"].to(device),
+                        attention_mask=batch["attention_mask"].to(device),
+                    )[0]
+                    parameters = parameters.float()
+                    encoder_hidden_states = encoder_hidden_states.float()
+                    for j, idx in enumerate(indices):
+                        cache.put(
+                            image_keys[idx],
+                            prompt_keys[idx],
+                            parameters[j].cpu(),
+                            encoder_hidden_states[j].cpu(),
+                        )
+
+        return LatentDataset(cache, image_keys, prompt_keys, sizes=dataset.sizes)
+
+    def tokenize_and_prepare_dataset(
+        self, cache_latents=False, device="cpu", image_size=512, aspect_buckets=False
+    ):
+        # rank 0 downloads and fills the on-disk caches, the other ranks
+        # wait and then only read them
+        if not distributed.is_main():
+            distributed.barrier()
+        dataset = ImageDataset(
+            self.dataset,
+            self.tokenizer,
+            image_size=image_size,
+            buckets=bucket_sizes(image_size) if aspect_buckets else None,
+        )
+        if cache_latents:
+            dataset = self.precompute_latents(dataset, device)
+        if distributed.is_main():
+            distributed.barrier()
         split = int(0.8 * len(dataset))
         self.train_dataset = torch.utils.data.Subset(dataset, range(0, split))
         self.val_dataset = torch.utils.data.Subset(dataset, range(split, len(dataset)))
+        return self.train_dataset, self.val_dataset
+
+    def encode_batch(self, batch, device, timer=None):
+        timer = timer or StepTimer()
+        if "latent_parameters" in batch:
+            with timer.section("vae"):
+                latents = DiagonalGaussianDistribution(
+                    batch["latent_parameters"].to(device)
+                ).sample()
+            encoder_hidden_states = batch["encoder_hidden_states"].to(device)
+        else:
+            pixel_values = batch["pixel_values"].to(device)
+            input_ids = batch["input_ids"].to(device)
+            attention_mask = batch["attention_mask"].to(device)
+
+            # frozen encoders: no autograd graph, clone out of inference mode
+            # so the UNet can use the results in its backward pass
+            with torch.inference_mode():
+                # --- Encode image to 4-channel latents ---
+                with timer.section("vae"):
+                    latents = self.pipeline.vae.encode(
+                        pixel_values
+                    ).latent_dist.sample()
+
+                # Encode text
+                with timer.section("text"):
+                    encoder_hidden_states = self.pipeline.text_encoder(
+                        input_ids=input_ids, attention_mask=attention_mask
+                    )[0]
+            latents = latents.clone()
+            encoder_hidden_states = encoder_hidden_states.clone()
+
+        latents = latents * self.pipeline.vae.config.scaling_factor
+        return latents, encoder_hidden_states
+
+    def training_step(self, batch, device, timer=None):
+        timer = timer or StepTimer()
+        with autocast(self.precision):
+            latents, encoder_hidden_states = self.encode_batch(batch, device, timer)
+        latents = latents.float()
+
+        # Create noise
+        noise = torch.randn_like(latents).to(device)
+
+        # Random timesteps
+        timesteps = torch.randint(
+            0,
+            self.noise_scheduler.config.num_train_timesteps,
+            (latents.size(0),),
+            device=device,
+        ).long()
+
+        noisy_latents = self.noise_scheduler.add_noise(latents, noise, timesteps)
+
+        # Predict noise with UNet (through the DDP wrapper when distributed)
+        unet = self.ddp_unet if self.ddp_unet is not None else self.unet
+        with timer.section("unet"), autocast(self.precision):
+            model_pred = unet(noisy_latents, timesteps, encoder_hidden_states).sample
+
+        return torch.nn.functional.mse_loss(model_pred.float(), noise.float())
+
+    def prepare_validation(self, device, val_samples=8, batch_size=2, seed=0):
+        # encode a fixed slice of the validation set once, with fixed noise
+        # and timesteps, so successive validation losses are comparable
+        subset = Subset(
+            self.val_dataset, range(min(val_samples, len(self.val_dataset)))
+        )
+        self.validation_batches = []
+        with torch.random.fork_rng():
+            torch.manual_seed(seed)
+            sampler = BucketBatchSampler(
+                dataset_sizes(subset), batch_size, shuffle=False
+            )
+            for batch in DataLoader(subset, batch_sampler=sampler):
+                with autocast(self.precision):
+                    latents, encoder_hidden_states = self.encode_batch(batch, device)
+                latents = latents.float()
+                noise = torch.randn_like(latents)
+                timesteps = torch.randint(
+                    0,
+                    self.noise_scheduler.config.num_train_timesteps,
+                    (latents.size(0),),
+                    device=device,
+                ).long()
+                self.validation_batches.append(
+                    (latents, encoder_hidden_states, noise, timesteps)
+                )
+
+    def validate(self):
+        if not self.validation_batches:
+            return None
+        self.unet.eval()
+        losses = []
+        with torch.inference_mode(), autocast(self.precision):
+            for (
+                latents,
+                encoder_hidden_states,
+                noise,
+                timesteps,
+            ) in self.validation_batches:
+                noisy_latents = self.noise_scheduler.add_noise(
+                    latents, noise, timesteps
+                )
+                model_pred = self.unet(
+                    noisy_latents, timesteps, encoder_hidden_states
+                ).sample
+                losses.append(
+                    torch.nn.functional.mse_loss(model_pred.float(), noise).item()
+                )
+        self.unet.train()
+        return sum(losses) / len(losses)
+
+    def trainable_state(self):
+        return {
+            name: p.detach()
+            for name, p in self.unet.named_parameters()
+            if p.requires_grad
+        }
+
+    def prepare_unet(self, gradient_checkpointing=False, lora_rank=0):
+        self.pipeline.vae.requires_grad_(False)
+        self.pipeline.text_encoder.requires_grad_(False)
+        self.pipeline.vae.eval()
+        self.pipeline.text_encoder.eval()
+
+        self.lora_rank = lora_rank
+        if lora_rank:
+            try:
+                from peft import LoraConfig
+            except ImportError as e:
+                raise ImportError(
+                    "LoRA training needs peft: uv sync --extra lora"
+                ) from e
+            self.unet.requires_grad_(False)
+            self.unet.add_adapter(
+                LoraConfig(
+                    r=lora_rank,
+                    lora_alpha=lora_rank,
+                    init_lora_weights="gaussian",
+                    target_modules=["to_k", "to_q", "to_v", "to_out.0"],
+                )
+            )
+        if gradient_checkpointing:
+            self.unet.enable_gradient_checkpointing()
+        self.unet.train()
+        return [p for p in self.unet.parameters() if p.requires_grad]
+
+    def save_unet(self, out_dir):
+        if not self.lora_rank:
+            self.unet.save_pretrained(os.path.join(out_dir, "unet"))
+            return
+        from diffusers.utils import convert_state_dict_to_diffusers
+        from peft.utils import get_peft_model_state_dict
+
+        StableDiffusionPipeline.save_lora_weights(
+            out_dir,
+            unet_lora_layers=convert_state_dict_to_diffusers(
+                get_peft_model_state_dict(self.unet)
+            ),
+        )
 
     def train(
         self,
@@ -56,100 +298,380 @@ class TrainImageModel:
         lr=1e-5,
         batch_size=2,
         out_dir=f"./models/image-model-finetuned_{time.strftime('%Y-%m-%d-%H-%M')}",
+        cache_latents=False,
+        precision="fp32",
+        gradient_accumulation_steps=1,
+        gradient_checkpointing=False,
+        lora_rank=0,
+        num_workers=4,
+        warmup_ratio=0.05,
+        validate_every=100,
+        val_samples=8,
+        checkpoint_every=200,
+        keep_checkpoints=2,
+        resume_from=None,
+        seed=0,
+        profile_start=10,
+        profile_steps=0,
+        resolution_schedule=None,
+        aspect_buckets=True,
+        on_validation=None,
+        register=True,
     ):
+        # resolution_schedule maps a start epoch to a training resolution,
+        # e.g. {0: 256, 2: 512}: the low-resolution epochs run the UNet on
+        # 4x fewer latent pixels. Validation always uses the last resolution.
+        # on_validation(samples_seen, val_loss) is called on rank 0 after
+        # each validation; returning False ends training early (single-process
+        # runs only: the other ranks would not see the stop).
+        device = "cpu"  # sorry but no have a lot of VRAM
+        self.precision = resolve(precision)
+        rank, world_size = distributed.setup()
+        out_dir = distributed.broadcast(out_dir)
+        torch.manual_seed(seed + rank)
 
         self.load_dataset()
         self.load_model()
-        self.tokenize_and_prepare_dataset()
-
-        train_loader = DataLoader(
-            self.train_dataset, batch_size=batch_size, shuffle=True
+        schedule = sorted(
+            (int(start), size)
+            for start, size in (resolution_schedule or {0: 512}).items()
+        )
+        resolution = {
+            epoch: [size for start, size in schedule if start <= epoch][-1]
+            for epoch in range(epochs)
+        }
+        # batches hold one aspect-ratio bucket each, reshuffled per epoch
+        # from seed so a resumed run sees the same batch order
+        splits, samplers = {}, {}
+        for size in dict.fromkeys(size for _, size in schedule):
+            splits[size] = self.tokenize_and_prepare_dataset(
+                cache_latents=cache_latents,
+                device=device,
+                image_size=size,
+                aspect_buckets=aspect_buckets,
+            )
+            samplers[size] = BucketBatchSampler(
+                dataset_sizes(splits[size][0]),
+                batch_size,
+                seed=seed,
+                num_replicas=world_size,
+                rank=rank,
+            )
+        self.train_dataset, self.val_dataset = splits[schedule[-1][1]]
+
+        params = self.prepare_unet(gradient_checkpointing, lora_rank)
+        optimizer = torch.optim.AdamW(params, lr=lr)
+
+        total_steps = sum(
+            math.ceil(len(samplers[resolution[epoch]]) / gradient_accumulation_steps)
+            for epoch in range(epochs)
         )
-
-        optimizer = torch.optim.AdamW(self.unet.parameters(), lr=lr)
-
         lr_scheduler = get_scheduler(
             "linear",
             optimizer=optimizer,
-            num_warmup_steps=500,
-            num_training_steps=len(train_loader) * epochs,
+            num_warmup_steps=int(warmup_ratio * total_steps),
+            num_training_steps=total_steps,
         )
 
-        device = "cpu"  # sorry but no have a lot of VRAM
-
         self.unet.to(device)
         self.pipeline.text_encoder.to(device)
         self.pipeline.vae.to(device)
+        channels_last(self.unet, self.pipeline.vae)
 
-        global_step = 0
+        if rank == 0 and validate_every:
+            self.prepare_validation(device, val_samples=val_samples, seed=seed)
 
+        global_step = 0
+        start_epoch = 0
+        skip_batches = 0
         loss_save_result = []
-        for epoch in range(epochs):
-            for batch in train_loader:
-                optimizer.zero_grad()
+        val_loss_result = []
 
-                pixel_values = batch["pixel_values"].to(device)
-                input_ids = batch["input_ids"].to(device)
-                attention_mask = batch["attention_mask"].to(device)
-
-                # --- Encode image to 4-channel latents ---
-                with torch.no_grad():
-                    latents = self.pipeline.vae.encode(
-                        pixel_values
-                    ).latent_dist.sample()
-                    latents = latents * self.pipeline.vae.config.scaling_factor
-
-                # Create noise
-                noise = torch.randn_like(latents).to(device)
-
-                # Random timesteps
-                timesteps = torch.randint(
-                    0,
-                    self.noise_scheduler.config.num_train_timesteps,
-                    (latents.size(0),),
-                    device=device,
-                ).long()
-
-                noisy_latents = self.noise_scheduler.add_noise(
-                    latents, noise, timesteps
+        checkpointer = Checkpointer(
+            os.path.join(out_dir, "checkpoints"), keep=keep_checkpoints
+        )
+        if resume_from == "latest":
+            resume_from = checkpointer.latest()
+        if resume_from:
+            state = checkpointer.load(resume_from, rank=rank)
+            # only the trainable weights are checkpointed, so the load is
+            # partial, but every one of them has to be restored
+            trainable = set(self.trainable_state())
+            result = self.unet.load_state_dict(state["unet"], strict=False)
+            missing = sorted(trainable.intersection(result.missing_keys))
+            if missing or result.unexpected_keys:
+                raise RuntimeError(
+                    f"{resume_from} does not match the model: "
+                    f"missing {missing}, unexpected {result.unexpected_keys}"
                 )
-
-                # Encode text
-                encoder_hidden_states = self.pipeline.text_encoder(
-                    input_ids=input_ids, attention_mask=attention_mask
-                )[0]
-
-                # Predict noise with UNet
-                model_pred = self.unet(
-                    noisy_latents, timesteps, encoder_hidden_states
-                ).sample
-
-                loss = torch.nn.functional.mse_loss(model_pred, noise)
-                loss.backward()
-                optimizer.step()
-                lr_scheduler.step()
-
-                global_step += 1
-                if global_step % 10 == 0:
+            optimizer.load_state_dict(state["optimizer"])
+            lr_scheduler.load_state_dict(state["lr_scheduler"])
+            global_step = state["global_step"]
+            start_epoch = state["epoch"]
+            skip_batches = state["batch"]
+            loss_save_result = state["loss"]
+            val_loss_result = state["val_loss"]
+            if rank >= len(state["rng"]):
+                # saved with fewer ranks: a fresh stream per rank and step
+                torch.manual_seed(seed + rank + global_step)
+            if start_epoch < epochs and skip_batches >= len(
+                samplers[resolution[start_epoch]]
+            ):
+                start_epoch, skip_batches = start_epoch + 1, 0
+            if rank == 0:
+                print(f"Resumed from {resume_from} at step {global_step}")
+
+        if world_size > 1:
+            self.ddp_unet = DistributedDataParallel(self.unet)
+
+        metrics = None
+        if rank == 0:
+            DataManager.create_directory(out_dir)
+            metrics = MetricsLogger(os.path.join(out_dir, METRICS_FILE))
+        prof = profiler(
+            os.path.join(out_dir, "profiler"),
+            profile_start,
+            profile_steps if rank == 0 else 0,
+        )
+        timer = StepTimer()
+        step_samples = 0
+        step_start = time.perf_counter()
+        # "WxH" -> [samples, seconds] of data + forward + backward + the
+        # optimizer step, per epoch and for the whole run; micro-batches wait
+        # in group_buckets until their group's optimizer step is timed
+        bucket_epoch, bucket_total = {}, {}
+        group_buckets = []
+        stopped = False
+
+        with prof:
+            for epoch in range(start_epoch, epochs):
+                if stopped:
+                    break
+                train_dataset, _ = splits[resolution[epoch]]
+                sampler = samplers[resolution[epoch]]
+                sampler.set_epoch(epoch)
+                # on resume, drop the batches the checkpoint already consumed
+                # from the batch list rather than loading and discarding them
+                epoch_batches = sampler.batches()
+                num_batches = len(epoch_batches)
+                batches = iter(
+                    DataLoader(
+                        train_dataset,
+                        batch_sampler=epoch_batches[skip_batches:],
+                        num_workers=num_workers,
+                    )
+                )
+                optimizer.zero_grad()
+                for i in range(skip_batches, num_batches):
+                    micro_start = time.perf_counter()
+                    with timer.section("data"):
+                        batch = next(batches)
+                    sync_step = (i + 1) % gradient_accumulation_steps == 0 or (
+                        i + 1 == num_batches
+                    )
+                    # only all-reduce gradients on the micro-batch that steps
+                    no_sync = (
+                        self.ddp_unet.no_sync()
+                        if self.ddp_unet is not None and not sync_step
+                        else contextlib.nullcontext()
+                    )
+                    # the last group of an epoch may hold fewer micro-batches
+                    group_start = i - i % gradient_accumulation_steps
+                    group_size = min(
+                        gradient_accumulation_steps, num_batches - group_start
+                    )
+                    with no_sync:
+                        loss = self.training_step(batch, device, timer)
+                        with timer.section("unet"):
+                            (loss / group_size).backward()
+                    samples = len(next(iter(batch.values())))
+                    bucket = batch_bucket(batch)
+                    group_buckets.append(
+                        (bucket, samples, time.perf_counter() - micro_start)
+                    )
+                    step_samples += samples
+                    if not sync_step:
+                        continue
+
+                    optimizer_start = time.perf_counter()
+                    with timer.section("optimizer"):
+                        optimizer.step()
+                        lr_scheduler.step()
+                        optimizer.zero_grad()
+                    # the step is shared by the group, split by samples
+                    optimizer_time = time.perf_counter() - optimizer_start
+                    for name, n, seconds in group_buckets:
+                        for stats in (bucket_epoch, bucket_total):
+                            entry = stats.setdefault(name, [0, 0.0])
+                            entry[0] += n
+                            entry[1] += seconds + optimizer_time * n / step_samples
+                    group_buckets = []
+                    prof.step()
+
+                    global_step += 1
+                    if global_step % 10 == 0:
+                        step_loss = distributed.all_reduce_mean(loss.item())
+                        if rank == 0:
+                            print(
+                                f"Epoch {epoch} | Step {global_step} | Loss {step_loss:.4f}"
+                            )
+                        loss_save_result.append(step_loss)
+
+                    step_time = time.perf_counter() - step_start
+                    if metrics is not None:
+                        metrics.log(
+                            step=global_step,
+                            epoch=epoch,
+                            bucket=bucket,
+                            loss=loss.item(),
+                            lr=lr_scheduler.get_last_lr()[0],
+                            step_time=step_time,
+                            breakdown=timer.reset(),
+                            samples_per_s=step_samples * world_size / step_time,
+                        )
+                    timer.reset()
+                    step_samples = 0
+
+                    checkpoint_due = (
+                        checkpoint_every and global_step % checkpoint_every == 0
+                    )
+                    # collective: every rank hands its random state to rank 0
+                    rng_states = (
+                        distributed.gather(Checkpointer.rng_state())
+                        if checkpoint_due
+                        else None
+                    )
+                    if rank == 0:
+                        if validate_every and global_step % validate_every == 0:
+                            val_loss = self.validate()
+                        else:
+                            val_loss = None
+                        # validate() returns None when the validation split is empty
+                        if val_loss is not None:
+                            print(
+                                f"Epoch {epoch} | Step {global_step} | Val loss {val_loss:.4f}"
+                            )
+                            val_loss_result.append((global_step, val_loss))
+                            metrics.log(step=global_step, val_loss=val_loss)
+                            if on_validation is not None and not on_validation(
+                                global_step * batch_size * gradient_accumulation_steps,
+                                val_loss,
+                            ):
+                                stopped = True
+                        if checkpoint_due:
+                            checkpointer.save(
+                                global_step,
+                                {
+                                    "unet": self.trainable_state(),
+                                    "optimizer": optimizer.state_dict(),
+                                    "lr_scheduler": lr_scheduler.state_dict(),
+                                    "global_step": global_step,
+                                    "epoch": epoch,
+                                    "batch": i + 1,
+                                    "loss": loss_save_result,
+                                    "val_loss": val_loss_result,
+                                },
+                                rng=rng_states,
+                            )
+                    # validation and checkpoint snapshots are not step time
+                    step_start = time.perf_counter()
+                    if stopped:
+                        break
+                skip_batches = 0
+                if rank == 0:
                     print(
-                        f"Epoch {epoch} | Step {global_step} | Loss {loss.item():.4f}"
+                        f"Epoch {epoch} | {resolution[epoch]}px | "
+                        + ", ".join(
+                            f"{bucket} {n / seconds:.2f} samples/s ({n})"
+                            for bucket, (n, seconds) in bucket_epoch.items()
+                        )
                     )
-                    loss_save_result.append(loss.item())
-
-        DataManager.create_directory(out_dir)
+                bucket_epoch = {}
+
+        if rank != 0:
+            distributed.cleanup()
+            return
+
+        val_loss = self.validate() if validate_every and not stopped else None
+        if val_loss is not None:
+            print(f"Final val loss {val_loss:.4f}")
+            val_loss_result.append((global_step, val_loss))
+            metrics.log(step=global_step, val_loss=val_loss)
+            if on_validation is not None:
+                on_validation(
+                    global_step * batch_size * gradient_accumulation_steps, val_loss
+                )
+        checkpointer.wait()
+        metrics.close()
 
-        plt.figure()
-        plt.plot([x for x in range(len(loss_save_result))], loss_save_result)
-        plt.xlabel("epoch")
-        plt.ylabel("loss")
-        plt.title("Training loss")
-        plt.savefig(os.path.join(out_dir, "training_loss.png"))
-        plt.close()
+        memory = {
+            "peak_rss_mb": peak_rss_mb(),
+            "trainable_params_mb": tensor_mb(params),
+            "optimizer_state_mb": optimizer_state_mb(optimizer),
+        }
+        print(memory)
 
-        self.unet.save_pretrained(os.path.join(out_dir, "unet"))
+        self.save_unet(out_dir)
         self.tokenizer.save_pretrained(out_dir)
+        if not register:
+            distributed.cleanup()
+            return out_dir
+
+        ModelRegistry().register(
+            out_dir,
+            kind="image-model",
+            metrics={
+                "loss": loss_save_result[-1] if loss_save_result else None,
+                "val_loss": val_loss_result[-1][1] if val_loss_result else None,
+                **memory,
+                "world_size": world_size,
+                "bucket_samples_per_s": {
+                    bucket: n / seconds for bucket, (n, seconds) in bucket_total.items()
+                },
+            },
+        )
+        distributed.cleanup()
+        return out_dir
+
+
+def parse_resolution_schedule(text):
+    # "0:256,2:512" -> {0: 256, 2: 512}
+    try:
+        return {
+            int(epoch): int(size)
+            for epoch, size in (pair.split(":") for pair in text.split(","))
+        }
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected start_epoch:resolution pairs, got {text!r}"
+        )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out-dir", help="run directory, reuse it to resume")
+    parser.add_argument(
+        "--resume", help="checkpoint directory, or 'latest' in --out-dir"
+    )
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument(
+        "--resolution-schedule",
+        type=parse_resolution_schedule,
+        default=None,
+        help="start epoch:resolution pairs, e.g. '0:256,2:512' (default: 512 throughout)",
+    )
+    args = parser.parse_args()
+    if args.resume == "latest" and not args.out_dir:
+        # the default out-dir is a new timestamped directory: nothing to resume
+        parser.error("--resume latest needs the --out-dir of the run to resume")
+
     trainer = TrainImageModel()
-    trainer.train(epochs=1, lr=1e-5)
+    kwargs = {"out_dir": args.out_dir} if args.out_dir else {}
+    trainer.train(
+        epochs=args.epochs,
+        lr=1e-5,
+        cache_latents=True,
+        resume_from=args.resume,
+        resolution_schedule=args.resolution_schedule,
+        **kwargs,
+    )
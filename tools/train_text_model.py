@@ -1,11 +1,96 @@
+from itertools import islice
 import time
 
-from src.commons.data_manager import DataManager
-from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments
+from src.commons import distributed
+from src.commons.dataset_loader import DatasetLoader
+from src.commons.model_registry import ModelRegistry
+from src.commons.precision import resolve
+from src.commons.telemetry import METRICS_FILE, MetricsLogger, profiler
+from src.commons.text_backend import export_onnx
+from src.commons.token_dataset import TokenBlockDataset
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments,
+)
 import torch
+from torch.utils.data import Subset
 
 import os
-import matplotlib.pyplot as plt
+
+
+class TelemetryCallback(TrainerCallback):
+    # per-step timing from the Trainer's hooks: data is the gap between
+    # steps (the batches are fetched there), compute runs up to the
+    # optimizer step
+    def __init__(self, output_dir, profile_start=10, profile_steps=0):
+        self.output_dir = output_dir
+        self.profile_start = profile_start
+        self.profile_steps = profile_steps
+        self.metrics = None
+        self.profiler = None
+        self.marks = {}
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        if not state.is_world_process_zero:
+            return
+        self.metrics = MetricsLogger(os.path.join(self.output_dir, METRICS_FILE))
+        self.profiler = profiler(
+            os.path.join(self.output_dir, "profiler"),
+            self.profile_start,
+            self.profile_steps,
+        )
+        self.profiler.__enter__()
+        self.marks["step_end"] = time.perf_counter()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self.marks["step_begin"] = time.perf_counter()
+
+    def on_pre_optimizer_step(self, args, state, control, **kwargs):
+        self.marks["optimizer"] = time.perf_counter()
+
+    def on_step_end(self, args, state, control, lr_scheduler=None, **kwargs):
+        if self.metrics is None:
+            return
+        now = time.perf_counter()
+        step_begin = self.marks["step_begin"]
+        optimizer = self.marks.pop("optimizer", now)
+        step_time = now - self.marks["step_end"]
+        samples = (
+            args.per_device_train_batch_size
+            * args.gradient_accumulation_steps
+            * args.world_size
+        )
+        self.metrics.log(
+            step=state.global_step,
+            epoch=state.epoch,
+            lr=lr_scheduler.get_last_lr()[0] if lr_scheduler else None,
+            step_time=step_time,
+            breakdown={
+                "data": step_begin - self.marks["step_end"],
+                "compute": optimizer - step_begin,
+                "optimizer": now - optimizer,
+            },
+            samples_per_s=samples / step_time,
+        )
+        self.profiler.step()
+        self.marks["step_end"] = time.perf_counter()
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if self.metrics is None or not logs:
+            return
+        values = {k: logs[k] for k in ("loss", "eval_loss") if k in logs}
+        if values:
+            self.metrics.log(step=state.global_step, **values)
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if self.metrics is None:
+            return
+        self.profiler.__exit__(None, None, None)
+        self.metrics.close()
+        self.metrics = None
 
 
 class TrainTextModel:
@@ -17,86 +102,128 @@ class TrainTextModel:
         self.train_data = []
         self.val_data = []
         self.dataset = []
+        self.token_stats = {}
 
     def load_dataset(self):
-        dataset_path = DataManager.ls_directory("dataset")
-        dataset = []
-        for file_name in dataset_path:
-            if file_name.endswith(".json"):
-                data = DataManager.load_json(f"dataset/{file_name}")
-                dataset.extend(data)
-        self.dataset = dataset
+        self.dataset = DatasetLoader("dataset")
 
-    def load_model(self):
-        model_name = "distilgpt2"  # "huggyllama/llama-7b"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(model_name)
+    model_name = "distilgpt2"  # "huggyllama/llama-7b"
+
+    def load_tokenizer(self):
+        # enough for tokenize_dataset, without loading the weights
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
         self.tokenizer.pad_token = self.tokenizer.eos_token
+
+    def load_model(self):
+        self.load_tokenizer()
+        self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
         self.model.config.pad_token_id = self.tokenizer.eos_token_id
 
-    def tokenize_dataset(self):
-        for article in self.dataset:
-            if isinstance(article, str):
-                text = article["title"] + "\n" + article["content"]
-            else:
-                text = article["title"] + "\n" + "".join(article["content"])
-            tokenized = self.tokenizer(
-                text,
-                return_tensors="pt",
-                truncation=True,
-                padding="max_length",
-                max_length=512,
+    def tokenize_dataset(
+        self, max_length: int = 512, pack: bool = False, batch_size: int = 256
+    ):
+        texts = (
+            article["title"] + "\n" + article["content"] for article in self.dataset
+        )
+
+        ids = []
+        elapsed = 0.0
+        while batch := list(islice(texts, batch_size)):
+            start = time.perf_counter()
+            ids.extend(
+                self.tokenizer(
+                    batch,
+                    truncation=not pack,
+                    max_length=None if pack else max_length,
+                )["input_ids"]
             )
-            self.inputs.append(tokenized)
+            elapsed += time.perf_counter() - start
+
+        if pack:
+            self.inputs = TokenBlockDataset.packed(
+                ids, max_length, self.tokenizer.eos_token_id
+            )
+        else:
+            self.inputs = TokenBlockDataset.padded(
+                ids, max_length, self.tokenizer.pad_token_id
+            )
+
+        self.token_stats = {
+            "tokenize_tokens_per_s": sum(len(i) for i in ids) / max(elapsed, 1e-9),
+            "padding_ratio": self.inputs.padding_ratio,
+            "blocks": len(self.inputs),
+        }
+        print(self.token_stats)
 
     def split_dataset(self):
         split_idx = int(0.8 * len(self.inputs))
-        self.train_data = self.inputs[:split_idx]
-        self.val_data = self.inputs[split_idx:]
+        self.train_data = Subset(self.inputs, range(0, split_idx))
+        self.val_data = Subset(self.inputs, range(split_idx, len(self.inputs)))
 
     @staticmethod
     def data_collator(features):
         batch = {}
-        batch["input_ids"] = torch.stack(
-            [torch.tensor(f["input_ids"]) for f in features]
+        batch["input_ids"] = torch.stack([f["input_ids"] for f in features])
+        batch["attention_mask"] = torch.stack([f["attention_mask"] for f in features])
+        # no loss on padding (pad_token is eos, so mask by attention)
+        batch["labels"] = batch["input_ids"].masked_fill(
+            batch["attention_mask"] == 0, -100
         )
-        batch["attention_mask"] = torch.stack(
-            [torch.tensor(f["attention_mask"]) for f in features]
-        )
-        batch["labels"] = batch["input_ids"].clone()
         return batch
 
-    @staticmethod
-    def graph_data(trainer, output_dir):
-        os.makedirs(output_dir, exist_ok=True)
-        history = trainer.state.log_history
-        loss_entries = [h for h in history if "loss" in h]
-        if loss_entries:
-            steps = [h.get("step", i) for i, h in enumerate(loss_entries)]
-            losses = [h["loss"] for h in loss_entries]
-            plt.figure()
-            plt.plot(steps, losses, marker="o")
-            plt.xlabel("step")
-            plt.ylabel("loss")
-            plt.title("Training loss")
-            plt.savefig(os.path.join(output_dir, "training_loss.png"))
-            plt.close()
-
-    def run(self, epochs: int = 3, lr: float = 5e-5):
-        output_dir = f"./models/text-model-finetuned_{time.strftime('%Y-%m-%d-%H-%M')}"
-        self.load_dataset()
+    def run(
+        self,
+        epochs: int = 3,
+        lr: float = 5e-5,
+        pack: bool = True,
+        precision: str = "fp32",
+        num_workers: int = 4,
+        profile_steps: int = 0,
+        export: bool = True,
+        batch_size: int = 2,
+        output_dir: str = None,
+        dataset_path: str = None,
+        eval_steps: int = None,
+        callbacks=(),
+        register: bool = True,
+    ):
+        # dataset_path: blocks saved by TokenBlockDataset.save, shared by
+        # sweep trials instead of re-tokenizing; eval_steps turns on
+        # periodic validation
+        precision = resolve(precision)
+        if precision == "int8":
+            raise ValueError("int8 is an inference-only precision")
+        _, world_size = distributed.setup()
+        output_dir = distributed.broadcast(
+            output_dir
+            or f"./models/text-model-finetuned_{time.strftime('%Y-%m-%d-%H-%M')}"
+        )
         self.load_model()
-        self.tokenize_dataset()
+        if dataset_path is None:
+            self.load_dataset()
+            self.tokenize_dataset(pack=pack)
+        else:
+            self.inputs = TokenBlockDataset.load(dataset_path)
+            self.token_stats = {
+                "padding_ratio": self.inputs.padding_ratio,
+                "blocks": len(self.inputs),
+            }
         self.split_dataset()
         training_args = TrainingArguments(
             output_dir=output_dir,
             learning_rate=lr,
-            per_device_train_batch_size=2,
-            per_device_eval_batch_size=2,
+            per_device_train_batch_size=batch_size,
+            per_device_eval_batch_size=batch_size,
             num_train_epochs=epochs,
             weight_decay=0.01,
             logging_steps=10,
+            eval_strategy="steps" if eval_steps else "no",
+            eval_steps=eval_steps,
             save_strategy="epoch",
+            bf16=precision == "bf16",
+            dataloader_num_workers=num_workers,
+            dataloader_persistent_workers=num_workers > 0,
+            ddp_backend="gloo" if world_size > 1 else None,
             # use_cpu=True,
         )
 
@@ -106,16 +233,60 @@ class TrainTextModel:
             train_dataset=self.train_data,
             eval_dataset=self.val_data,
             data_collator=self.data_collator,
+            callbacks=[
+                TelemetryCallback(output_dir, profile_steps=profile_steps),
+                *callbacks,
+            ],
         )
 
-        trainer.train()
-
-        self.graph_data(trainer, output_dir)
-
+        train_output = trainer.train()
+        # a last validation at the end of the run, unless a callback stopped
+        # it early
+        if eval_steps and trainer.state.global_step >= trainer.state.max_steps:
+            trainer.evaluate()
+        samples_per_s = train_output.metrics.get("train_samples_per_second", 0.0)
+        tokens_per_s = (
+            samples_per_s
+            * self.inputs.input_ids.size(1)
+            * (1 - self.token_stats["padding_ratio"])
+        )
         trainer.save_model(output_dir)
+        if not trainer.is_world_process_zero():
+            return output_dir
+
+        print(
+            f"train tokens/s {tokens_per_s:.1f} | "
+            f"padding ratio {self.token_stats['padding_ratio']:.2%}"
+        )
 
         self.tokenizer.save_pretrained(output_dir)
 
+        if not register:
+            return output_dir
+
+        # the ONNX decoder lands in output_dir/onnx, so the registry entry
+        # below hashes it together with the HF checkpoint
+        exported = None
+        if export:
+            # any failure (missing optimum, an unsupported op in the
+            # exporter) only costs the ONNX backend, not the trained model
+            try:
+                exported = export_onnx(output_dir)
+            except Exception as e:
+                print(f"[WARNING] Skipping ONNX export: {e}")
+
+        ModelRegistry().register(
+            output_dir,
+            kind="text-model",
+            metrics={
+                **train_output.metrics,
+                **self.token_stats,
+                "world_size": world_size,
+                "export": exported,
+            },
+        )
+        return output_dir
+
 
 if __name__ == "__main__":
     trainer = TrainTextModel()